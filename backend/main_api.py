@@ -1,18 +1,33 @@
 import os
 import logging
 import traceback
-import shutil
-from typing import List, Optional, Annotated # Make sure Annotated is here
-import colorlog
+import threading
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Annotated # Make sure Annotated is here
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException # Removed Depends as it's not used directly here
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Request # Removed Depends as it's not used directly here
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+# Configure logging before importing the pipeline so its import-time logs are captured.
+# Modules are imported by their top-level names (as they import each other) so that
+# shared state such as the report-id context variable exists exactly once.
+from log_config import setup_logging, log_context
+setup_logging()
 try:
-    from src.orchestrator import ReportGenerator
+    from orchestrator import ReportGenerator
+    from batch import parse_manifest, stream_batch_archive, batch_worker_count
+    from assets import AssetStore, AssetTooLargeError, MAX_UPLOAD_BYTES
+    from retention import BuildJanitor
+    from job_store import JobStore, new_job_id
+    from orchestrator import resume_job, run_job_recovery, job_output_base
+    from preview import OUTPUT_FORMATS, OUTPUT_FORMAT_PDF
+    from profiling import parse_profile_mode, TRACE_SUFFIX, CPROFILE_SUFFIX
 except ImportError as e:
     print(f"ERROR: Could not import ReportGenerator. Ensure 'src' is in PYTHONPATH or accessible. Details: {e}")
     sys.exit(1)
@@ -20,10 +35,24 @@ except RuntimeError as e:
     print(f"ERROR: Initialization error (likely API key). Details: {e}")
     sys.exit(1)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    build_janitor.start()
+    # Pick up jobs whose worker died mid-build (e.g. a previous crash of this server).
+    recovery_stop = threading.Event()
+    threading.Thread(
+        target=run_job_recovery, args=(job_store, recovery_stop, JOB_RECOVERY_INTERVAL_SECONDS),
+        name="job-recovery", daemon=True
+    ).start()
+    yield
+    recovery_stop.set()
+    build_janitor.stop()
+
 app = FastAPI(
     title="AI Report Generator API",
     description="API to generate LaTeX reports using Gemini and RAG.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 origins = [
@@ -31,53 +60,137 @@ origins = [
     "http://127.0.0.1:4200",
 ]
 
+# Whole-request cap: a logo, a figure and the form fields. Checked before the body is parsed.
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(2 * MAX_UPLOAD_BYTES + 1024 * 1024)))
+
+class RequestBodyLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with HTTP 413 before they are parsed.
+    Starlette's multipart parser receives a whole upload (spooling it to a temp file
+    past 1 MB) before any handler runs, so AssetStore's per-file cap alone would
+    only fire after a huge upload had already reached the disk.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request body exceeds the {self.max_bytes / (1024 * 1024):.1f} MB limit."
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                # Chunked bodies (no Content-Length) are cut off as soon as they pass the cap.
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Added before CORS so that CORS wraps it and 413 responses stay readable by the frontend.
+app.add_middleware(RequestBodyLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-)
-
-log_level_str = os.getenv("LOG_LEVEL", "INFO").upper()
-log_level = getattr(logging, log_level_str, logging.INFO)
-
-console_handler = colorlog.StreamHandler(sys.stdout)
-console_handler.setFormatter(colorlog.ColoredFormatter(
-    fmt='%(log_color)s%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    log_colors={
-        'DEBUG':    'cyan',
-        'INFO':     'green',
-        'WARNING':  'yellow',
-        'ERROR':    'red',
-        'CRITICAL': 'bold_red',
-    }
-))
-
-file_handler = logging.FileHandler("api_report_generator.log", mode='w')
-file_handler.setFormatter(logging.Formatter(
-    fmt='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-))
-
-logging.basicConfig(
-    level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("api_report_generator.log", mode='w')
-    ]
+    # Browsers hide non-safelisted response headers from cross-origin scripts unless exposed.
+    expose_headers=["X-Report-Id", "X-Report-Url", "X-Report-Trace-Url"],
 )
 
 logger = logging.getLogger(__name__)
-logger.setLevel(log_level)
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
 
 REPORTS_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "build")
-API_TEMP_UPLOADS_DIR = os.path.join(REPORTS_OUTPUT_DIR, "api_temp_uploads")
+API_ASSETS_DIR = os.path.join(REPORTS_OUTPUT_DIR, "assets")
+API_JOBS_DIR = os.path.join(REPORTS_OUTPUT_DIR, "jobs")
+JOB_RECOVERY_INTERVAL_SECONDS = float(os.getenv("JOB_RECOVERY_INTERVAL_SECONDS", "300"))
 
 os.makedirs(REPORTS_OUTPUT_DIR, exist_ok=True)
-os.makedirs(API_TEMP_UPLOADS_DIR, exist_ok=True)
+asset_store = AssetStore(API_ASSETS_DIR)
+job_store = JobStore(API_JOBS_DIR)
+
+def _is_in_use(path: str) -> bool:
+    # Never evict an asset an in-flight request still references, or the workspace of a job that
+    # can still be resumed; a failed job's record (and so its workspace) goes once job_store.prune drops it.
+    if os.path.dirname(path) == job_store.root_dir:
+        return job_store.is_resumable(os.path.basename(path))
+    return asset_store.refcount(path) > 0
+
+build_janitor = BuildJanitor(REPORTS_OUTPUT_DIR, protect=_is_in_use,
+                             on_sweep=lambda: job_store.prune(build_janitor.max_age_seconds))
+
+# Media types of everything a build can produce (PDF, .tex fallback, previews).
+REPORT_MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".tex": "application/x-tex",
+    ".html": "text/html; charset=utf-8",
+    ".md": "text/markdown; charset=utf-8",
+    ".json": "application/json",             # performance traces (<report>.trace.json)
+    ".prof": "application/octet-stream",     # cProfile data
+}
+
+def _report_media_type(path: str) -> str:
+    return REPORT_MEDIA_TYPES[os.path.splitext(path)[1]]
+
+def _download_filename(title: str, report_path: str, suffix: Optional[str] = None) -> str:
+    # Files on disk are named after the job id; users download them under the report title.
+    safe_download_title = "".join(c for c in title if c.isalnum() or c in [' ', '_', '-']).strip().replace(' ', '_')
+    return f"{safe_download_title or 'report'}{suffix or os.path.splitext(report_path)[1]}"
+
+def _parse_profile(value: Optional[str]) -> Optional[str]:
+    try:
+        return parse_profile_mode(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _report_headers(report_id: str, report_path: str, profile_mode: Optional[str]) -> Dict[str, str]:
+    headers = {"X-Report-Id": report_id, "X-Report-Url": f"/jobs/{report_id}/report"}
+    if profile_mode and os.path.exists(os.path.splitext(report_path)[0] + TRACE_SUFFIX):
+        headers["X-Report-Trace-Url"] = f"/jobs/{report_id}/trace"
+    return headers
+
+def _file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def _is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _report_file_response(request: Optional[Request], path: str, download_filename: str, media_type: str, headers: Optional[dict] = None):
+    """
+    Serves a build artifact with a strong ETag. Range and If-Range requests are handled
+    by Starlette's FileResponse; conditional GETs are answered here with a bodyless 304.
+    """
+    stat_result = os.stat(path)
+    etag = _file_etag(stat_result)
+    response_headers = {"ETag": etag, "Accept-Ranges": "bytes", **(headers or {})}
+    build_janitor.touch(path)
+    if request is not None and _is_not_modified(request, etag, stat_result):
+        response_headers["Last-Modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        return Response(status_code=304, headers=response_headers)
+    return FileResponse(path=path, filename=download_filename, media_type=media_type,
+                        headers=response_headers, stat_result=stat_result)
 
 @app.post("/generate-report", response_class=FileResponse)
 async def generate_report_endpoint(
@@ -92,105 +205,207 @@ async def generate_report_endpoint(
     no_rag: Annotated[Optional[bool], Form()] = False,
     # --- NEW PARAMETERS for user figure ---
     user_figure: Annotated[Optional[UploadFile], File(description="User-uploaded figure for the report")] = None,
-    user_figure_caption: Annotated[Optional[str], Form(description="Caption for the user-uploaded figure")] = ""
+    user_figure_caption: Annotated[Optional[str], Form(description="Caption for the user-uploaded figure")] = "",
     # --- END NEW PARAMETERS ---
+    output_format: Annotated[str, Form(description="pdf, or html/markdown for an instant preview without LaTeX")] = OUTPUT_FORMAT_PDF,
+    profile: Annotated[Optional[str], Form(description="trace or cprofile: write a performance trace of this build")] = None,
+    x_report_profile: Annotated[Optional[str], Header()] = None
 ):
-    logger.info(f"--- Stage 0: /generate-report ENDPOINT HIT for title: '{title}' ---")
-    abs_logo_path: Optional[str] = None
-    abs_user_figure_path: Optional[str] = None # For user-uploaded figure
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    profile_mode = _parse_profile(profile if profile is not None else x_report_profile)
+    # The id is also the only handle for downloading the report later, so it must be unguessable.
+    report_id = new_job_id()
+    with log_context(report_id):
+        logger.info("--- Stage 0: /generate-report ENDPOINT HIT for title: '%s' ---", title)
+        abs_logo_path: Optional[str] = None
+        abs_user_figure_path: Optional[str] = None # For user-uploaded figure
 
-    try:
-        logger.info(f"--- Stage 1: Handling logo upload if present ---")
-        if logo and logo.filename:
-            safe_logo_filename = "".join(c for c in logo.filename if c.isalnum() or c in ['.', '_', '-']).strip()
-            if not safe_logo_filename: safe_logo_filename = f"uploaded_logo{os.path.splitext(logo.filename)[1]}"
-            abs_logo_path = os.path.join(API_TEMP_UPLOADS_DIR, safe_logo_filename)
-            with open(abs_logo_path, "wb") as buffer:
-                shutil.copyfileobj(logo.file, buffer)
-            logger.info(f"--- Stage 1B: Logo saved to: {abs_logo_path} ---")
-        else:
-            logger.info(f"--- Stage 1B: No logo uploaded or filename empty. ---")
-
-        # --- NEW: Handle User Figure Upload ---
-        logger.info(f"--- Stage 1.5: Handling user figure upload if present ---")
-        if user_figure and user_figure.filename:
-            safe_figure_filename = "".join(c for c in user_figure.filename if c.isalnum() or c in ['.', '_', '-']).strip()
-            if not safe_figure_filename:
-                safe_figure_filename = f"user_uploaded_figure{os.path.splitext(user_figure.filename)[1]}"
-            abs_user_figure_path = os.path.join(API_TEMP_UPLOADS_DIR, safe_figure_filename)
-            with open(abs_user_figure_path, "wb") as buffer:
-                shutil.copyfileobj(user_figure.file, buffer)
-            logger.info(f"--- Stage 1.5B: User figure saved to: {abs_user_figure_path} ---")
-        else:
-            logger.info(f"--- Stage 1.5B: No user figure uploaded or filename empty. ---")
-        # --- END NEW ---
-
-        logger.info(f"--- Stage 2: Parsing authors and mentors ---")
-        authors_list = [a.strip() for a in authors_str_from_form.split(',') if a.strip()] if authors_str_from_form else []
-        mentors_list = [m.strip() for m in mentors_str_from_form.split(',') if m.strip()] if mentors_str_from_form else []
-        logger.info(f"--- Stage 2B: Parsed authors: {authors_list}, Parsed mentors: {mentors_list} ---")
-
-        logger.info(f"--- Stage 3: PRE-INITIALIZATION of ReportGenerator ---")
-        report_generator_instance = ReportGenerator(
-            output_dir=REPORTS_OUTPUT_DIR,
-            temp_dir_name="api_orchestrator_temp",
-            use_rag=not no_rag
-        )
-        logger.info(f"--- Stage 3B: POST-INITIALIZATION of ReportGenerator ---")
-
-        logger.info(f"--- Stage 4: PRE-CALL to report_generator_instance.generate_report ---")
-        final_report_path = report_generator_instance.generate_report(
-            query=query,
-            report_title=title,
-            authors=authors_list,
-            date=date,
-            mentors=mentors_list,
-            university=university,
-            logo_path=abs_logo_path,
-            primary_color=color,
-            # --- NEW ARGUMENTS to pass to orchestrator ---
-            user_figure_path=abs_user_figure_path,
-            user_figure_caption=user_figure_caption
-            # --- END NEW ARGUMENTS ---
-        )
-        logger.info(f"--- Stage 4B: POST-CALL to report_generator_instance.generate_report --- Path: {final_report_path}")
-
-        if os.path.exists(final_report_path):
-            base_filename = os.path.basename(final_report_path)
-            safe_download_title = "".join(c for c in title if c.isalnum() or c in [' ', '_', '-']).strip().replace(' ', '_')
-            if not safe_download_title: safe_download_title = "report"
-            download_filename = f"{safe_download_title}{os.path.splitext(base_filename)[1]}"
-            media_type = 'application/pdf' if final_report_path.endswith('.pdf') else 'application/x-tex'
+        try:
+            logger.info("--- Stage 1: Handling logo upload if present ---")
+            if logo and logo.filename:
+                abs_logo_path = await asset_store.store_upload(logo)
+                logger.info("--- Stage 1B: Logo stored as asset: %s ---", abs_logo_path)
+            else:
+                logger.info("--- Stage 1B: No logo uploaded or filename empty. ---")
+
+            # --- NEW: Handle User Figure Upload ---
+            logger.info("--- Stage 1.5: Handling user figure upload if present ---")
+            if user_figure and user_figure.filename:
+                abs_user_figure_path = await asset_store.store_upload(user_figure)
+                logger.info("--- Stage 1.5B: User figure stored as asset: %s ---", abs_user_figure_path)
+            else:
+                logger.info("--- Stage 1.5B: No user figure uploaded or filename empty. ---")
+            # --- END NEW ---
+
+            logger.info("--- Stage 2: Parsing authors and mentors ---")
+            authors_list = [a.strip() for a in authors_str_from_form.split(',') if a.strip()] if authors_str_from_form else []
+            mentors_list = [m.strip() for m in mentors_str_from_form.split(',') if m.strip()] if mentors_str_from_form else []
+            logger.info("--- Stage 2B: Parsed authors: %s, Parsed mentors: %s ---", authors_list, mentors_list)
+
+            logger.info("--- Stage 3: PRE-INITIALIZATION of ReportGenerator ---")
+            # Each request is a job: it builds in its own job workspace and every stage is
+            # checkpointed, so a crashed build can be resumed instead of regenerated.
+            report_generator_instance = ReportGenerator(
+                output_dir=REPORTS_OUTPUT_DIR,
+                use_rag=not no_rag,
+                job_store=job_store
+            )
+            logger.info("--- Stage 3B: POST-INITIALIZATION of ReportGenerator ---")
+
+            logger.info("--- Stage 4: PRE-CALL to report_generator_instance.generate_report ---")
+            final_report_path = await run_in_threadpool(
+                report_generator_instance.generate_report,
+                query=query,
+                report_title=title,
+                authors=authors_list,
+                date=date,
+                mentors=mentors_list,
+                university=university,
+                logo_path=abs_logo_path,
+                primary_color=color,
+                # --- NEW ARGUMENTS to pass to orchestrator ---
+                user_figure_path=abs_user_figure_path,
+                user_figure_caption=user_figure_caption,
+                # --- END NEW ARGUMENTS ---
+                report_id=report_id,
+                job_id=report_id,
+                output_format=output_format,
+                profile=profile_mode
+            )
+            logger.info("--- Stage 4B: POST-CALL to report_generator_instance.generate_report --- Path: %s", final_report_path)
+
+            if os.path.exists(final_report_path):
+                download_filename = _download_filename(title, final_report_path)
+                media_type = _report_media_type(final_report_path)
             
-            logger.info(f"Report generation successful. Sending file: {final_report_path} as {download_filename} with type {media_type}")
-            return FileResponse(path=final_report_path, filename=download_filename, media_type=media_type)
-        else:
-            logger.error(f"Report generation failed post-call: Output file not found at {final_report_path}")
-            raise HTTPException(status_code=500, detail="Report generation completed but output file not found on server.")
-
-    except HTTPException as http_exc:
-        logger.error(f"HTTPException during report generation: {http_exc.detail} (Status: {http_exc.status_code})")
-        raise
-    except Exception as e:
-        logger.error(f"--- Stage X: UNEXPECTED ERROR in generate_report_endpoint: {e} ---")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred on the server: {str(e)}")
-    finally:
-        logger.info(f"--- Stage Y: FINALLY block for generate_report_endpoint ---")
-        if abs_logo_path and os.path.exists(abs_logo_path):
-            try:
-                os.remove(abs_logo_path)
-                logger.info(f"Cleaned up temporary logo: {abs_logo_path}")
-            except Exception as e_clean_logo:
-                logger.warning(f"Could not clean up temporary logo {abs_logo_path}: {e_clean_logo}")
-        # --- NEW: Cleanup user figure ---
-        if abs_user_figure_path and os.path.exists(abs_user_figure_path):
-            try:
-                os.remove(abs_user_figure_path)
-                logger.info(f"Cleaned up temporary user figure: {abs_user_figure_path}")
-            except Exception as e_clean_fig:
-                logger.warning(f"Could not clean up temporary user figure {abs_user_figure_path}: {e_clean_fig}")
-        # --- END NEW ---
+                logger.info("Report generation successful. Sending file: %s as %s with type %s", final_report_path, download_filename, media_type)
+                return _report_file_response(
+                    None, final_report_path, download_filename, media_type,
+                    headers=_report_headers(report_id, final_report_path, profile_mode)
+                )
+            else:
+                logger.error("Report generation failed post-call: Output file not found at %s", final_report_path)
+                raise HTTPException(status_code=500, detail="Report generation completed but output file not found on server.")
+
+        except AssetTooLargeError as size_exc:
+            logger.error("Upload rejected: %s", size_exc)
+            raise HTTPException(status_code=413, detail=str(size_exc))
+        except HTTPException as http_exc:
+            logger.error("HTTPException during report generation: %s (Status: %s)", http_exc.detail, http_exc.status_code)
+            raise
+        except Exception as e:
+            logger.error("--- Stage X: UNEXPECTED ERROR in generate_report_endpoint: %s ---", e)
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred on the server: {str(e)}")
+        finally:
+            logger.info("--- Stage Y: FINALLY block for generate_report_endpoint ---")
+            # Stored assets are shared between requests; only drop this request's references.
+            asset_store.release(abs_logo_path)
+            asset_store.release(abs_user_figure_path)
+
+@app.post("/generate-batch", response_class=StreamingResponse)
+async def generate_batch_endpoint(
+    manifest: Annotated[UploadFile, File(description="JSONL or CSV manifest, one report spec per line/row")],
+    logo: Annotated[Optional[UploadFile], File(description="Logo shared by every report in the batch")] = None,
+    max_workers: Annotated[Optional[int], Form()] = None,
+    profile: Annotated[Optional[str], Form(description="trace or cprofile: add performance traces to the archive")] = None
+):
+    logger.info("--- /generate-batch ENDPOINT HIT with manifest: '%s' ---", manifest.filename)
+    profile_mode = _parse_profile(profile)
+    try:
+        manifest_text = (await manifest.read()).decode("utf-8-sig")
+        specs = parse_manifest(manifest_text, manifest.filename or "", allow_local_paths=False)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch manifest: {e}")
+    try:
+        # Clients may ask for fewer concurrent reports, never for more than BATCH_MAX_WORKERS.
+        max_workers = batch_worker_count(max_workers, len(specs))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    abs_logo_path: Optional[str] = None
+    if logo and logo.filename:
+        try:
+            abs_logo_path = await asset_store.store_upload(logo)
+        except AssetTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    def _release_batch_logo():
+        asset_store.release(abs_logo_path)
+
+    logger.info("Streaming batch archive for %s reports.", len(specs))
+    return StreamingResponse(
+        stream_batch_archive(specs, REPORTS_OUTPUT_DIR, max_workers=max_workers, shared_logo_path=abs_logo_path, profile=profile_mode),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="reports.zip"'},
+        background=BackgroundTask(_release_batch_logo)
+    )
+
+async def _job_artifact_response(request: Request, job_id: str, suffix: Optional[str] = None):
+    """Serves a job's report (or, with `suffix`, one of its trace files) under the report title."""
+    job = await run_in_threadpool(job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if suffix is None:
+        path = job["result_path"]
+    else:
+        path = job_output_base(job["params"]["output_dir"], job_id) + suffix
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Report not found.")
+    download_filename = _download_filename(job["params"]["report_title"], path, suffix)
+    return _report_file_response(request, path, download_filename, _report_media_type(path))
+
+# Downloads are addressed by job id only; file names on disk are never exposed.
+@app.get("/jobs/{job_id}/report", response_class=FileResponse)
+async def download_report_endpoint(job_id: str, request: Request):
+    return await _job_artifact_response(request, job_id)
+
+@app.get("/jobs/{job_id}/trace", response_class=FileResponse)
+async def download_trace_endpoint(job_id: str, request: Request):
+    return await _job_artifact_response(request, job_id, TRACE_SUFFIX)
+
+@app.get("/jobs/{job_id}/cprofile", response_class=FileResponse)
+async def download_cprofile_endpoint(job_id: str, request: Request):
+    return await _job_artifact_response(request, job_id, CPROFILE_SUFFIX)
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    job = await run_in_threadpool(job_store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    result_path = job["result_path"]
+    trace_path = job_output_base(job["params"]["output_dir"], job_id) + TRACE_SUFFIX
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "completed_stages": job["stages"],
+        "error": job["error"],
+        "report_url": f"/jobs/{job_id}/report" if result_path and os.path.exists(result_path) else None,
+        "trace_url": f"/jobs/{job_id}/trace" if os.path.exists(trace_path) else None,
+    }
+
+@app.post("/jobs/{job_id}/resume", response_class=FileResponse)
+async def resume_job_endpoint(job_id: str, output_format: Optional[str] = None, profile: Optional[str] = None):
+    """
+    Re-runs a failed or interrupted job; completed stages are restored, not regenerated.
+    `?output_format=pdf` builds the PDF of a job that was first generated as a preview;
+    `?profile=trace` records a performance trace of the resumed run.
+    """
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    profile_mode = _parse_profile(profile)
+    with log_context(job_id):
+        try:
+            final_report_path = await run_in_threadpool(resume_job, job_store, job_id, output_format, profile_mode)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        job = await run_in_threadpool(job_store.get_job, job_id)
+        download_filename = _download_filename(job["params"]["report_title"], final_report_path)
+        return _report_file_response(None, final_report_path, download_filename, _report_media_type(final_report_path),
+                                     headers=_report_headers(job_id, final_report_path, profile_mode))
 
 @app.get("/health", status_code=200)
 async def health_check():
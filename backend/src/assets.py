@@ -0,0 +1,154 @@
+# backend/src/assets.py
+"""
+Content-addressed store for uploaded assets (logos, figures).
+
+Uploads are read in chunks from the UploadFile and hashed as they are read. By
+then Starlette has already received the whole multipart body (files over 1 MB
+sit in its temporary spool file), so the total request size is capped earlier,
+by the API's request-body limit (MAX_REQUEST_BYTES); MAX_UPLOAD_BYTES here is a
+per-file cap. Files up to ASSET_SPOOL_BYTES stay in memory until the hash is
+known, so an asset that is already stored (the same university logo on every
+request) costs no write into the store; larger ones are copied to a temporary
+file first. Each asset is kept once under its SHA-256 and linked into build
+workspaces instead of being copied.
+"""
+
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+import aiofiles
+
+logger = logging.getLogger()
+
+UPLOAD_CHUNK_BYTES = 256 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+# Uploads up to this size are hashed in memory before anything touches the disk.
+ASSET_SPOOL_BYTES = int(os.getenv("ASSET_SPOOL_BYTES", str(2 * 1024 * 1024)))
+
+class AssetTooLargeError(ValueError):
+    """Raised when an uploaded file exceeds the per-file size cap."""
+
+def _safe_extension(filename: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r'\.[a-z0-9]{1,5}', ext) else ""
+
+def link_into_workspace(asset_path: str, workspace_dir: str) -> str:
+    """
+    Makes `asset_path` available inside `workspace_dir` under the same basename.
+    Prefers a hard link, then a symlink, and only copies as a last resort.
+    """
+    os.makedirs(workspace_dir, exist_ok=True)
+    dest_path = os.path.join(workspace_dir, os.path.basename(asset_path))
+    if os.path.lexists(dest_path):
+        if os.path.exists(dest_path) and os.path.samefile(asset_path, dest_path):
+            return dest_path
+        os.remove(dest_path)
+    try:
+        os.link(asset_path, dest_path)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(asset_path), dest_path)
+        except OSError:
+            shutil.copy2(asset_path, dest_path)
+    return dest_path
+
+class AssetStore:
+    def __init__(self, root_dir: str, max_upload_bytes: int = MAX_UPLOAD_BYTES, spool_bytes: int = ASSET_SPOOL_BYTES):
+        self.root_dir = os.path.abspath(root_dir)
+        self.tmp_dir = os.path.join(self.root_dir, "tmp")
+        self.max_upload_bytes = max_upload_bytes
+        self.spool_bytes = spool_bytes
+        self._refcounts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _acquire(self, asset_path: str) -> str:
+        with self._lock:
+            self._refcounts[asset_path] = self._refcounts.get(asset_path, 0) + 1
+        return asset_path
+
+    def release(self, asset_path: Optional[str]) -> int:
+        """Drops one reference to an asset and returns the remaining count."""
+        if not asset_path:
+            return 0
+        with self._lock:
+            remaining = max(0, self._refcounts.get(asset_path, 0) - 1)
+            if remaining:
+                self._refcounts[asset_path] = remaining
+            else:
+                self._refcounts.pop(asset_path, None)
+        return remaining
+
+    def refcount(self, asset_path: str) -> int:
+        with self._lock:
+            return self._refcounts.get(asset_path, 0)
+
+    async def store_upload(self, upload, max_bytes: Optional[int] = None) -> str:
+        """
+        Copies an UploadFile into the store and returns the stored asset's path
+        with one reference held by the caller (see `release`).
+        Raises AssetTooLargeError as soon as the file passes the per-file cap; the
+        request itself was already received (see MAX_REQUEST_BYTES in main_api).
+        """
+        limit = max_bytes or self.max_upload_bytes
+        hasher = hashlib.sha256()
+        memory_chunks = []
+        total = 0
+        spill_path = None
+        spill_file = None
+
+        try:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > limit:
+                    raise AssetTooLargeError(f"Upload '{upload.filename}' exceeds the {limit / (1024 * 1024):.1f} MB limit.")
+                hasher.update(chunk)
+                if spill_file is None and total <= self.spool_bytes:
+                    memory_chunks.append(chunk)
+                    continue
+                if spill_file is None:
+                    spill_path = os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+                    spill_file = await aiofiles.open(spill_path, "wb")
+                    for buffered in memory_chunks:
+                        await spill_file.write(buffered)
+                    memory_chunks = []
+                await spill_file.write(chunk)
+        except BaseException:
+            if spill_file is not None:
+                await spill_file.close()
+                os.remove(spill_path)
+            raise
+
+        if spill_file is not None:
+            await spill_file.close()
+
+        asset_path = os.path.join(self.root_dir, f"{hasher.hexdigest()}{_safe_extension(upload.filename)}")
+        if os.path.exists(asset_path):
+            logger.info("Asset already stored, reusing: %s", os.path.basename(asset_path))
+            if spill_path:
+                os.remove(spill_path)
+            try:
+                # The build janitor evicts by age and LRU on mtime: a logo uploaded long ago but
+                # reused on every request must count as recently used.
+                os.utime(asset_path)
+            except OSError as e:
+                logger.warning("Could not refresh the timestamps of asset %s: %s", asset_path, e)
+            return self._acquire(asset_path)
+
+        if spill_path is None:
+            spill_path = os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+            async with aiofiles.open(spill_path, "wb") as f:
+                for buffered in memory_chunks:
+                    await f.write(buffered)
+        os.replace(spill_path, asset_path)
+        logger.info("Stored new asset %s (%s bytes)", os.path.basename(asset_path), total)
+        return self._acquire(asset_path)
@@ -0,0 +1,283 @@
+# backend/src/batch.py
+"""
+Bulk report generation: reads a JSONL/CSV manifest of report specs, builds the
+reports concurrently and streams a zip of the outputs plus per-item status.
+
+Concurrency is bounded by the shared pools the rest of the pipeline already uses
+(the Gemini request budget in generator.py and the pdflatex pool in
+orchestrator.py), so the batch worker count only controls how many reports are
+in flight; it does not multiply API or CPU pressure.
+"""
+
+import os
+import io
+import re
+import csv
+import sys
+import json
+import time
+import uuid
+import zipfile
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict, Any, Iterator, BinaryIO
+
+from generator import GEMINI_MAX_CONCURRENCY
+from orchestrator import ReportGenerator
+from log_config import setup_logging
+from profiling import PROFILE_MODES, PROFILE_TRACE, profile_artifacts
+
+logger = logging.getLogger()
+
+# Reports spend much of their time sleeping between sections or waiting on
+# pdflatex, so more reports than Gemini slots can be in flight at once.
+BATCH_MAX_WORKERS = max(1, int(os.getenv("BATCH_MAX_WORKERS", str(2 * GEMINI_MAX_CONCURRENCY))))
+# Largest manifest accepted through the API; every item is a full report build.
+BATCH_MAX_ITEMS = max(1, int(os.getenv("BATCH_MAX_ITEMS", "100")))
+DEFAULT_PRIMARY_COLOR = "0, 51, 102"
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+def _split_names(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if not value:
+        return []
+    separator = ';' if ';' in str(value) else ','
+    return [v.strip() for v in str(value).split(separator) if v.strip()]
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in _TRUE_VALUES
+
+def _normalize_spec(raw: Dict[str, Any], index: int, seen_ids: set, allow_local_paths: bool) -> Dict[str, Any]:
+    title = str(raw.get("title") or "").strip()
+    query = str(raw.get("query") or "").strip()
+    if not title or not query:
+        raise ValueError(f"Manifest item {index + 1} is missing a 'title' or 'query'.")
+
+    base_id = re.sub(r'[^\w-]', '_', str(raw.get("id") or "").strip()) or f"item{index + 1:03d}"
+    # Ids name the item's build directory and archive entries, so they must be unique;
+    # a suffixed id can itself be taken by an explicit id (e.g. "x_3", "x", "x").
+    item_id, suffix = base_id, index + 1
+    while item_id in seen_ids:
+        item_id = f"{base_id}_{suffix}"
+        suffix += 1
+    seen_ids.add(item_id)
+
+    spec = {
+        "id": item_id,
+        "title": title,
+        "query": query,
+        "authors": _split_names(raw.get("authors")),
+        "date": raw.get("date") or None,
+        "mentors": _split_names(raw.get("mentors")),
+        "university": raw.get("university") or None,
+        "color": raw.get("color") or DEFAULT_PRIMARY_COLOR,
+        "use_rag": not _as_bool(raw.get("no_rag")),
+        "logo_path": None,
+        "user_figure_path": None,
+        "user_figure_caption": raw.get("user_figure_caption") or "",
+    }
+    # File paths only make sense for trusted, local manifests (the CLI); the API
+    # never lets a manifest point at files on the server.
+    if allow_local_paths:
+        for key in ("logo_path", "user_figure_path"):
+            path = raw.get(key) or raw.get(key.replace("_path", ""))
+            if path:
+                if not os.path.isfile(path):
+                    raise ValueError(f"Manifest item {index + 1}: file not found for '{key}': {path}")
+                spec[key] = os.path.abspath(path)
+    return spec
+
+def parse_manifest(
+    content: str, filename: str = "", allow_local_paths: bool = False, max_items: Optional[int] = BATCH_MAX_ITEMS
+) -> List[Dict[str, Any]]:
+    """
+    Parses a JSONL or CSV manifest into normalized report specs.
+    The format is taken from the file extension, falling back to sniffing the first line.
+    Manifests with more than `max_items` specs are rejected (None: no limit).
+    """
+    content = content.lstrip('\ufeff')
+    is_jsonl = filename.lower().endswith(('.jsonl', '.json', '.ndjson')) or content.lstrip().startswith('{')
+
+    if is_jsonl:
+        raw_items = []
+        for line_no, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on manifest line {line_no}: {e}")
+            if not isinstance(item, dict):
+                raise ValueError(f"Manifest line {line_no} is not a JSON object.")
+            raw_items.append(item)
+    else:
+        raw_items = [
+            {k.strip(): v for k, v in row.items() if k}
+            for row in csv.DictReader(io.StringIO(content))
+        ]
+
+    if not raw_items:
+        raise ValueError("Manifest contains no report specs.")
+    if max_items is not None and len(raw_items) > max_items:
+        raise ValueError(f"Manifest contains {len(raw_items)} report specs; at most {max_items} are allowed.")
+
+    seen_ids: set = set()
+    return [_normalize_spec(raw, i, seen_ids, allow_local_paths) for i, raw in enumerate(raw_items)]
+
+def _run_item(spec: Dict[str, Any], batch_id: str, batch_dir: str, shared_logo_path: Optional[str], profile: Optional[str] = None) -> Dict[str, Any]:
+    # Every item gets its own output and workspace directory so concurrent builds
+    # never share .tex/.aux files or collide on identical titles.
+    item_dir = os.path.join(batch_dir, spec["id"])
+    started = time.monotonic()
+    result = {"id": spec["id"], "title": spec["title"], "status": "failed", "path": None, "error": None}
+    try:
+        report_generator = ReportGenerator(output_dir=item_dir, temp_dir_name="work", use_rag=spec["use_rag"])
+        final_path = report_generator.generate_report(
+            query=spec["query"],
+            report_title=spec["title"],
+            authors=spec["authors"],
+            date=spec["date"],
+            mentors=spec["mentors"],
+            university=spec["university"],
+            logo_path=spec["logo_path"] or shared_logo_path,
+            primary_color=spec["color"],
+            user_figure_path=spec["user_figure_path"],
+            user_figure_caption=spec["user_figure_caption"],
+            report_id=f"{batch_id}/{spec['id']}",
+            profile=profile,
+        )
+        if final_path and os.path.exists(final_path):
+            result["path"] = final_path
+            result["status"] = "ok" if final_path.endswith('.pdf') else "tex_only"
+        else:
+            result["error"] = "Output file not found after generation."
+    except Exception as e:
+        logger.error("Batch item '%s' failed: %s", spec['id'], e)
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+def batch_worker_count(max_workers: Optional[int], item_count: int) -> int:
+    """Reports built at once: the requested count, never above BATCH_MAX_WORKERS. Raises ValueError if not positive."""
+    if max_workers is not None and max_workers <= 0:
+        raise ValueError(f"max_workers must be a positive number, got {max_workers}.")
+    return max(1, min(max_workers or BATCH_MAX_WORKERS, BATCH_MAX_WORKERS, item_count))
+
+def run_batch(
+    specs: List[Dict[str, Any]], output_dir: str, max_workers: Optional[int] = None,
+    shared_logo_path: Optional[str] = None, profile: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Builds every spec concurrently and yields each item's result as soon as it finishes.
+    With `profile`, each item also gets a performance trace (see profiling.py).
+    """
+    batch_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    batch_dir = os.path.join(os.path.abspath(output_dir), "batches", batch_id)
+    os.makedirs(batch_dir, exist_ok=True)
+    workers = batch_worker_count(max_workers, len(specs))
+    logger.info("Starting batch %s: %s reports, %s workers, dir: %s", batch_id, len(specs), workers, batch_dir)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        futures = [executor.submit(_run_item, spec, batch_id, batch_dir, shared_logo_path, profile) for spec in specs]
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            logger.info("Batch %s: item '%s' finished with status '%s' (%s/%s)", batch_id, result['id'], result['status'], done_count, len(specs))
+            yield result
+    logger.info("Batch %s finished in %.1fs", batch_id, time.monotonic() - started)
+
+class _ZipChunkSink:
+    """Write-only, non-seekable file object that buffers zip bytes until they are drained."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def _archive_name(result: Dict[str, Any]) -> str:
+    return f"{result['id']}{os.path.splitext(result['path'])[1]}"
+
+def stream_batch_archive(
+    specs: List[Dict[str, Any]], output_dir: str, max_workers: Optional[int] = None,
+    shared_logo_path: Optional[str] = None, profile: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Yields a zip archive chunk by chunk. Each report and its status record are
+    appended as soon as the item finishes; `status.jsonl` closes the archive.
+    Performance traces of profiled items are stored under `profiles/`.
+    """
+    sink = _ZipChunkSink()
+    statuses = []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result in run_batch(specs, output_dir, max_workers, shared_logo_path, profile):
+            record = {k: v for k, v in result.items() if k != "path"}
+            if result["path"]:
+                record["file"] = _archive_name(result)
+                # PDFs are already compressed internally; storing them avoids burning CPU for nothing.
+                compress = zipfile.ZIP_STORED if result["path"].endswith('.pdf') else zipfile.ZIP_DEFLATED
+                archive.write(result["path"], arcname=record["file"], compress_type=compress)
+                if profile:
+                    report_base = os.path.splitext(result["path"])[0]
+                    for artifact in profile_artifacts(result["path"]):
+                        archive.write(artifact, arcname=f"profiles/{result['id']}{artifact[len(report_base):]}")
+            archive.writestr(f"status/{result['id']}.json", json.dumps(record, indent=2))
+            statuses.append(record)
+            yield sink.drain()
+        archive.writestr("status.jsonl", "".join(json.dumps(r) + "\n" for r in statuses))
+    yield sink.drain()
+
+def write_batch_archive(
+    specs: List[Dict[str, Any]], output_dir: str, archive_file: BinaryIO, max_workers: Optional[int] = None,
+    profile: Optional[str] = None
+):
+    for chunk in stream_batch_archive(specs, output_dir, max_workers, profile=profile):
+        archive_file.write(chunk)
+        archive_file.flush()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate many reports from a JSONL/CSV manifest into a zip archive.")
+    parser.add_argument("manifest", help="Path to a .jsonl or .csv manifest of report specs.")
+    parser.add_argument("-o", "--output", default="reports.zip", help="Path of the zip archive to write.")
+    parser.add_argument("--build-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build"),
+                        help="Directory where per-item build workspaces are created.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help=f"Reports built concurrently (default and maximum: BATCH_MAX_WORKERS={BATCH_MAX_WORKERS}).")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_TRACE, choices=PROFILE_MODES, default=None,
+                        help="Add a Chrome-trace timeline (and with 'cprofile', cProfile data) of each report to the archive.")
+    args = parser.parse_args(argv)
+
+    setup_logging(log_file=None)
+
+    try:
+        with open(args.manifest, "r", encoding="utf-8-sig") as f:
+            specs = parse_manifest(f.read(), args.manifest, allow_local_paths=True, max_items=None)
+    except (OSError, ValueError) as e:
+        logger.error("Could not read manifest: %s", e)
+        return 2
+
+    with open(args.output, "wb") as archive_file:
+        write_batch_archive(specs, args.build_dir, archive_file, args.workers, args.profile)
+    logger.info("Batch archive written to %s", args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,13 @@ from latex_utils import escape_latex_special_chars
 
 logger = logging.getLogger()
 
+# Rendered logo width as a fraction of \textwidth (also used to size the normalized image).
+LOGO_WIDTH_FRACTION = 0.3
+
+# Template-only commands and environments, accepted when the cover is validated before compiling.
+COVER_LATEX_COMMANDS = {"Huge", "LARGE", "Large", "bfseries", "color", "vfill"}
+COVER_LATEX_ENVIRONMENTS = {"titlepage"}
+
 def generate_cover_page(
     report_title: str,
     authors: List[str],
@@ -21,7 +28,7 @@ def generate_cover_page(
     """
     Generates the LaTeX content for the cover page with the corrected layout and escaping.
     """
-    logger.info(f"Generating cover page for '{report_title}' -> writing to '{output_path}'")
+    logger.info("Generating cover page for '%s' -> writing to '%s'", report_title, output_path)
 
     escaped_title = escape_latex_special_chars(report_title)
     escaped_university = escape_latex_special_chars(university)
@@ -31,7 +38,7 @@ def generate_cover_page(
     mentors_latex = "\\\\ \n".join([f"\\Large {escape_latex_special_chars(mentor)}" for mentor in mentors]) if mentors else ""
 
     logo_filename = os.path.basename(logo_path) if logo_path and os.path.exists(logo_path) else None
-    logo_cmd = f"\\includegraphics[width=0.3\\textwidth,keepaspectratio]{{{logo_filename}}}" if logo_filename else ""
+    logo_cmd = f"\\includegraphics[width={LOGO_WIDTH_FRACTION}\\textwidth,keepaspectratio]{{{logo_filename}}}" if logo_filename else ""
 
     cover_content = f"""
 \\begin{{titlepage}}
@@ -72,5 +79,5 @@ def generate_cover_page(
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(cover_content)
-    logger.info(f"Successfully wrote cover.tex to {output_path}")
+    logger.info("Successfully wrote cover.tex to %s", output_path)
     return output_path
\ No newline at end of file
@@ -2,9 +2,17 @@
 import os
 import logging
 import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError, wait
+from typing import Any, Dict, Optional, Tuple
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 
+from model_router import ModelRouter, TASK_SECTION
+from profiling import span, traced_sleep
+
 logger = logging.getLogger()
 
 try:
@@ -16,58 +24,281 @@ try:
     
     MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
     model = genai.GenerativeModel(MODEL_NAME)
-    logger.info(f"Successfully loaded and configured Gemini model: {MODEL_NAME}")
+    logger.info("Successfully loaded and configured Gemini model: %s", MODEL_NAME)
 
 except Exception as e:
-    logger.critical(f"Fatal error during Gemini initialization: {e}")
+    logger.critical("Fatal error during Gemini initialization: %s", e)
     logger.critical("The application cannot function without a valid model. Please check your API key and model name.")
     raise
 
-def call_gemini(prompt: str, max_retries: int = 3, min_response_length: int = 10) -> str:
+# Each call is routed to a model tier by its task type (see model_router); `model` above is the main tier.
+router = ModelRouter.from_env()
+_models = {MODEL_NAME: model}
+_models_lock = threading.Lock()
+logger.info("Gemini model tiers: %s", router.tiers)
+
+def _get_model(model_name: str):
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+# Shared budget of in-flight Gemini requests for the whole process, so concurrent
+# reports (API requests or a batch run) cannot exceed the API quota together.
+GEMINI_MAX_CONCURRENCY = max(1, int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")))
+_gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+
+# Per-attempt deadline passed to the SDK; an expired attempt raises DeadlineExceeded and is retried.
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "90"))
+# Hedging: when an attempt is slower than this percentile of recent attempts, a duplicate
+# request is sent and the first good response wins. 0 disables hedging.
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+# Cap on duplicate requests in flight across the process, which bounds the extra quota spent.
+GEMINI_HEDGE_MAX_IN_FLIGHT = max(0, int(os.getenv("GEMINI_HEDGE_MAX_IN_FLIGHT", "1")))
+# Recent attempts needed before the percentile is trusted enough to hedge on.
+GEMINI_HEDGE_MIN_SAMPLES = max(1, int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20")))
+
+class LatencyTracker:
+    """Sliding window of recent latencies (seconds) with percentile queries."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples or not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+# Attempt latency (per model and task) drives the hedge delay; call latency (retries and
+# hedges included, overall and per task) is what the pipeline sees.
+_attempt_latency = LatencyTracker()
+_route_latency: Dict[Tuple[str, str], LatencyTracker] = {}
+_route_latency_lock = threading.Lock()
+_call_latency = LatencyTracker()
+_task_latency: Dict[str, LatencyTracker] = {}
+_hedge_slots = threading.BoundedSemaphore(GEMINI_HEDGE_MAX_IN_FLIGHT) if GEMINI_HEDGE_MAX_IN_FLIGHT else None
+# Sized so requests wait on _gemini_slots (where the hedge timer cannot see them) rather than in the executor queue.
+_hedge_executor = ThreadPoolExecutor(max_workers=4 * GEMINI_MAX_CONCURRENCY + GEMINI_HEDGE_MAX_IN_FLIGHT, thread_name_prefix="gemini")
+# Per task: attempts made, attempts that fired a hedge, and hedges that beat the primary.
+_hedge_stats: Dict[str, Dict[str, int]] = {}
+_hedge_stats_lock = threading.Lock()
+
+def _response_text(response) -> str:
+    if not response.parts:
+        return ""
+    return "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
+
+def _is_blocked(response) -> bool:
+    return bool(response.prompt_feedback and response.prompt_feedback.block_reason)
+
+def _is_good(response, min_response_length: int) -> bool:
+    # A blocked prompt is a final answer: retrying or duplicating it would not change it.
+    return _is_blocked(response) or len(_response_text(response)) >= min_response_length
+
+def _route_tracker(model_name: str, task: str) -> LatencyTracker:
+    with _route_latency_lock:
+        return _route_latency.setdefault((model_name, task), LatencyTracker())
+
+def _task_tracker(task: str) -> LatencyTracker:
+    with _route_latency_lock:
+        return _task_latency.setdefault(task, LatencyTracker())
+
+def _generate_once(prompt: str, model_name: str, task: str, min_response_length: int, started: Optional[threading.Event] = None):
+    queued = time.perf_counter()
+    with _gemini_slots:
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        try:
+            with span("gemini request", "llm", model=model_name, task=task, queued_ms=round((start - queued) * 1000, 1)):
+                response = _get_model(model_name).generate_content(prompt, request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
+        except Exception:
+            router.record(model_name, task, None, ok=False)
+            raise
+        elapsed = time.perf_counter() - start
+    _attempt_latency.record(elapsed)
+    _route_tracker(model_name, task).record(elapsed)
+    router.record(model_name, task, elapsed, ok=_is_good(response, min_response_length))
+    return response
+
+def _count_hedge(task: str, outcome: str):
+    with _hedge_stats_lock:
+        _hedge_stats.setdefault(task, {"attempts": 0, "hedged": 0, "won": 0})[outcome] += 1
+
+def _generate_hedged(prompt: str, model_name: str, task: str, min_response_length: int):
+    """
+    One attempt, hedged: if the request outlives the hedge delay and a hedge slot is free,
+    a duplicate is sent and the first good response (long enough, or blocked, which a
+    duplicate would not change) is returned. Errors surface only if every request failed.
+    """
+    _count_hedge(task, "attempts")
+    hedge_delay = (_route_tracker(model_name, task).percentile(GEMINI_HEDGE_PERCENTILE, GEMINI_HEDGE_MIN_SAMPLES)
+                   if GEMINI_HEDGE_PERCENTILE > 0 else None)
+    generate_args = (prompt, model_name, task, min_response_length)
+    if hedge_delay is None or _hedge_slots is None:
+        return _generate_once(*generate_args)
+
+    # Worker threads inherit the caller's context (report id in logs).
+    started = threading.Event()
+    primary = _hedge_executor.submit(contextvars.copy_context().run, _generate_once, *generate_args, started)
+    # Time spent queueing for a concurrency slot is not latency a duplicate could save.
+    started.wait()
+    try:
+        return primary.result(timeout=hedge_delay)
+    except FuturesTimeoutError:
+        pass
+    if not _hedge_slots.acquire(blocking=False):
+        return primary.result()
+
+    logger.debug("Gemini call slower than p%s (%.2fs); sending a hedged request.", GEMINI_HEDGE_PERCENTILE, hedge_delay)
+    _count_hedge(task, "hedged")
+    hedge = _hedge_executor.submit(contextvars.copy_context().run, _generate_once, *generate_args)
+    # The slot is held until the duplicate finishes, even if the primary wins first.
+    hedge.add_done_callback(lambda _: _hedge_slots.release())
+
+    pending, fallback, error = {primary, hedge}, None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = error or future.exception()
+                continue
+            response = future.result()
+            if _is_good(response, min_response_length):
+                if future is hedge:
+                    _count_hedge(task, "won")
+                return response
+            fallback = response
+    if fallback is not None:
+        return fallback
+    raise error
+
+def gemini_latency_stats() -> Dict[str, Any]:
+    """
+    Process-wide call latency percentiles (seconds) and hedging counters, overall and
+    per task type. Per task, "models" holds the single-attempt percentiles of each
+    model the task was routed to; "hedged"/"unhedged" count attempts.
+    """
+    with _hedge_stats_lock:
+        hedges = {task: dict(counts) for task, counts in _hedge_stats.items()}
+    with _route_latency_lock:
+        task_latency = dict(_task_latency)
+        route_latency = dict(_route_latency)
+    tasks = {}
+    for task, tracker in sorted(task_latency.items()):
+        counts = hedges.get(task, {"attempts": 0, "hedged": 0, "won": 0})
+        tasks[task] = {
+            "calls": len(tracker),
+            "p50": tracker.percentile(50),
+            "p95": tracker.percentile(95),
+            "p99": tracker.percentile(99),
+            "hedged": counts["hedged"],
+            "unhedged": counts["attempts"] - counts["hedged"],
+            "hedges_won": counts["won"],
+            "models": {
+                model_name: {"attempts": len(route), "p50": route.percentile(50), "p99": route.percentile(99)}
+                for (model_name, route_task), route in sorted(route_latency.items()) if route_task == task
+            },
+        }
+    return {
+        "calls": len(_call_latency),
+        "p50": _call_latency.percentile(50),
+        "p99": _call_latency.percentile(99),
+        "attempt_p50": _attempt_latency.percentile(50),
+        "attempt_p99": _attempt_latency.percentile(99),
+        "hedges_fired": sum(counts["hedged"] for counts in hedges.values()),
+        "hedges_won": sum(counts["won"] for counts in hedges.values()),
+        "tasks": tasks,
+    }
+
+def log_latency_stats():
+    stats = gemini_latency_stats()
+    if not stats["calls"]:
+        return
+    logger.info(
+        "Gemini latency over the last %s calls: p50=%.2fs p99=%.2fs (single attempt p50=%.2fs p99=%.2fs); hedges fired=%s won=%s",
+        stats["calls"], stats["p50"], stats["p99"], stats["attempt_p50"] or 0.0, stats["attempt_p99"] or 0.0,
+        stats["hedges_fired"], stats["hedges_won"]
+    )
+    # A slow tier on one task (e.g. section prose) is invisible in the process-wide numbers.
+    for task, task_stats in stats["tasks"].items():
+        if not task_stats["calls"]:
+            continue
+        logger.info(
+            "Gemini %s latency over the last %s calls: p50=%.2fs p95=%.2fs p99=%.2fs; attempts hedged=%s unhedged=%s (hedges won=%s); per model attempt p50/p99: %s",
+            task, task_stats["calls"], task_stats["p50"], task_stats["p95"], task_stats["p99"],
+            task_stats["hedged"], task_stats["unhedged"], task_stats["hedges_won"],
+            ", ".join(f"{model_name}={m['p50'] or 0.0:.2f}s/{m['p99'] or 0.0:.2f}s ({m['attempts']})"
+                      for model_name, m in task_stats["models"].items()) or "-"
+        )
+    logger.info("Gemini model health: %s", router.snapshot())
+
+def call_gemini(prompt: str, max_retries: int = 3, min_response_length: int = 10, task: str = TASK_SECTION) -> str:
     """
-    Sends a prompt to the globally configured Gemini model and returns the text response.
-    Includes robust retry logic with exponential backoff for API errors.
+    Sends a prompt to Gemini and returns the text response. `task` (a model_router task
+    type) selects the model tier; each attempt is routed afresh, so retries fail over to
+    another tier when the first one breaks its SLOs.
+    Includes robust retry logic with exponential backoff for API errors. Each attempt has
+    a deadline (GEMINI_TIMEOUT_SECONDS) and may be hedged with a duplicate request.
     """
+    start = time.perf_counter()
+    try:
+        with span("call_gemini", "llm", task=task):
+            return _call_gemini_with_retries(prompt, max_retries, min_response_length, task)
+    finally:
+        elapsed = time.perf_counter() - start
+        _call_latency.record(elapsed)
+        _task_tracker(task).record(elapsed)
+
+def _call_gemini_with_retries(prompt: str, max_retries: int, min_response_length: int, task: str) -> str:
     for attempt in range(max_retries):
         try:
-            logger.debug(f"Calling Gemini API (Attempt {attempt + 1}/{max_retries}). Prompt snippet: {prompt[:250]}...")
-            
-            response = model.generate_content(prompt)
+            model_name = router.choose(task)
+            logger.debug("Calling Gemini API %s for %s (Attempt %s/%s). Prompt snippet: %s...", model_name, task, attempt + 1, max_retries, prompt[:250])
             
-            if not response.parts:
-                text = ""
-            else:
-                text = "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
+            with span(f"attempt {attempt + 1}/{max_retries}", "retry", model=model_name):
+                response = _generate_hedged(prompt, model_name, task, min_response_length)
+            text = _response_text(response)
 
             if response.prompt_feedback and response.prompt_feedback.block_reason:
                 reason = response.prompt_feedback.block_reason_message or "Content policy violation"
-                logger.error(f"Prompt blocked by Gemini safety settings on attempt {attempt + 1}. Reason: {reason}")
+                logger.error("Prompt blocked by Gemini safety settings on attempt %s. Reason: %s", attempt + 1, reason)
                 return f"Error: The prompt was blocked by the safety filter. Reason: {reason}"
 
             if len(text) < min_response_length:
-                logger.warning(f"Gemini returned an empty or short response (len: {len(text)}). Retrying...")
+                logger.warning("Gemini returned an empty or short response (len: %s). Retrying...", len(text))
                 if attempt == max_retries - 1:
-                    logger.error(f"Gemini API call failed after {max_retries} retries: Response consistently too short.")
+                    logger.error("Gemini API call failed after %s retries: Response consistently too short.", max_retries)
                     return "Error: Failed to generate a valid response from the AI model after multiple retries."
-                time.sleep(2 ** attempt)  # Exponential backoff
+                traced_sleep(2 ** attempt, "backoff")  # Exponential backoff
                 continue
 
-            logger.debug(f"Successfully received response from Gemini. Snippet: {text[:250]}...")
+            logger.debug("Successfully received response from Gemini. Snippet: %s...", text[:250])
             return text
 
         except (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded) as e:
-            logger.warning(f"API rate limit or availability error on attempt {attempt + 1}: {e}. Retrying with backoff...")
+            logger.warning("API rate limit or availability error on attempt %s: %s. Retrying with backoff...", attempt + 1, e)
             if attempt == max_retries - 1:
-                logger.error(f"API calls failed after {max_retries} retries due to persistent API errors.")
+                logger.error("API calls failed after %s retries due to persistent API errors.", max_retries)
                 return f"Error: The AI service is currently unavailable or overloaded. Please try again later. Details: {str(e)}"
-            time.sleep(2 ** attempt)
+            traced_sleep(2 ** attempt, "backoff")
 
         except Exception as e:
-            logger.error(f"An unexpected error occurred calling Gemini API on attempt {attempt + 1}: {e}")
+            logger.error("An unexpected error occurred calling Gemini API on attempt %s: %s", attempt + 1, e)
             if attempt == max_retries - 1:
-                logger.error(f"All {max_retries} retry attempts failed.")
+                logger.error("All %s retry attempts failed.", max_retries)
                 return f"Error: An unexpected issue occurred while communicating with the AI model. Details: {str(e)}"
-            time.sleep(2 ** attempt)
+            traced_sleep(2 ** attempt, "backoff")
     
     
     return "Error: AI generation failed after all retry attempts."
@@ -0,0 +1,118 @@
+# backend/src/images.py
+"""
+Normalizes uploaded images before they reach LaTeX.
+
+Figures are never rendered wider than a fixed fraction of \\textwidth, so
+anything with more pixels than that (at IMAGE_TARGET_DPI) only slows down every
+pdflatex pass and inflates the PDF. Images are downscaled, re-encoded as JPEG
+(photos) or PNG (transparency, diagrams), stripped of metadata and cached by
+source hash so the work is done once per distinct upload.
+"""
+
+import os
+import re
+import uuid
+import hashlib
+import logging
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger()
+
+# a4paper with \geometry{margin=1in}, as set up in orchestrator._combine_latex_files.
+TEXTWIDTH_INCHES = 8.27 - 2 * 1.0
+TEXTHEIGHT_INCHES = 11.69 - 2 * 1.0
+IMAGE_TARGET_DPI = int(os.getenv("IMAGE_TARGET_DPI", "200"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_CACHE_DIR = os.getenv(
+    "IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build", "assets", "normalized")
+)
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def _source_digest(path: str) -> str:
+    # Assets from the content-addressed store are already named by their SHA-256.
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if _DIGEST_RE.match(stem):
+        return stem
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+# What Pillow reports for a plain JPEG/PNG. Anything else in `info` (EXIF, XMP, ICC profiles,
+# comments, PNG text chunks) is metadata that must not be passed through.
+_PLAIN_INFO_KEYS = frozenset({
+    "jfif", "jfif_version", "jfif_unit", "jfif_density", "dpi", "adobe", "adobe_transform",
+    "progressive", "progression", "gamma", "srgb", "transparency", "aspect",
+})
+
+def _has_metadata(img: Image.Image) -> bool:
+    return any(key not in _PLAIN_INFO_KEYS for key in img.info)
+
+def _has_transparency(img: Image.Image) -> bool:
+    if img.mode in ("RGBA", "LA", "PA"):
+        return True
+    return img.mode == "P" and "transparency" in img.info
+
+def normalize_image(src_path: str, width_fraction: float, cache_dir: Optional[str] = None, dpi: int = IMAGE_TARGET_DPI) -> str:
+    """
+    Returns the path of a version of `src_path` sized for `width_fraction` of
+    \\textwidth at `dpi`. Falls back to the original path for files Pillow cannot
+    read (e.g. PDF figures) or when the source is already a small JPEG/PNG without
+    metadata; small files that carry metadata are re-encoded to drop it.
+    """
+    cache_dir = cache_dir or IMAGE_CACHE_DIR
+    max_width = max(1, int(TEXTWIDTH_INCHES * width_fraction * dpi))
+    max_height = max(1, int(TEXTHEIGHT_INCHES * dpi))
+
+    try:
+        digest = _source_digest(src_path)
+        for ext in (".jpg", ".png"):
+            cached_path = os.path.join(cache_dir, f"{digest}-w{max_width}{ext}")
+            if os.path.exists(cached_path):
+                logger.debug("Using cached normalized image %s", os.path.basename(cached_path))
+                return cached_path
+
+        with Image.open(src_path) as img:
+            source_format = img.format
+            needs_resize = img.width > max_width or img.height > max_height
+            if not needs_resize and source_format in ("JPEG", "PNG") and not _has_metadata(img):
+                return src_path
+
+            # Diagrams and screenshots compress better (and stay sharp) as PNG; photos as JPEG.
+            transparent = _has_transparency(img)
+            keep_png = transparent or (source_format in ("PNG", "GIF", "BMP") and img.getcolors(256) is not None)
+
+            # Convert before resizing: Pillow resamples palette (and 1-bit) images with NEAREST,
+            # whatever filter is asked for.
+            out = ImageOps.exif_transpose(img).convert("RGBA" if transparent else "RGB")
+            out.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+
+            os.makedirs(cache_dir, exist_ok=True)
+            if keep_png:
+                if not transparent and out.getcolors(256) is not None:
+                    out = out.convert("P", palette=Image.Palette.ADAPTIVE, colors=256)
+                ext, save_kwargs = ".png", {"format": "PNG", "optimize": True}
+            else:
+                ext, save_kwargs = ".jpg", {"format": "JPEG", "quality": IMAGE_JPEG_QUALITY, "optimize": True}
+
+            cached_path = os.path.join(cache_dir, f"{digest}-w{max_width}{ext}")
+            tmp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+            # convert() copies `info`, and the PNG writer saves an ICC profile found there; clear it
+            # so that, without exif/icc kwargs, no metadata is written.
+            out.info = {}
+            out.save(tmp_path, **save_kwargs)
+            os.replace(tmp_path, cached_path)
+
+        logger.info(
+            "Normalized image %s: %s -> %s bytes (max width %spx)",
+            os.path.basename(src_path), os.path.getsize(src_path), os.path.getsize(cached_path), max_width
+        )
+        return cached_path
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning("Could not normalize image %s, using it as uploaded: %s", src_path, e)
+        return src_path
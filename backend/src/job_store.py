@@ -0,0 +1,275 @@
+# backend/src/job_store.py
+"""
+Durable local job store for report builds.
+
+Each job has a row in a SQLite database (its parameters, status and the worker
+holding its lease) and a workspace directory for its .tex fragments. Every
+pipeline stage writes its output here as soon as it completes, so a build that
+dies halfway can be resumed from the last completed stage by any worker on the
+same host. Workers hold a lease they renew on every stage write and from a
+heartbeat thread while a stage runs (LeaseHeartbeat); a job whose lease expired
+while still pending/running is considered abandoned. Stage writes and the final
+status update only succeed for the worker that still holds the lease, so a
+worker that lost its job to another one stops instead of overwriting its outputs.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger()
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_FINISHED = "finished"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result_path TEXT,
+    error TEXT,
+    worker_id TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs(status, lease_expires);
+"""
+
+class LeaseLostError(RuntimeError):
+    """Raised when a worker no longer holds the lease of the job it is building."""
+
+def new_job_id() -> str:
+    # Job ids double as download capabilities (/jobs/<id>/report), so they carry 128 random bits.
+    return uuid.uuid4().hex
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class JobStore:
+    def __init__(self, root_dir: str, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.root_dir = os.path.abspath(root_dir)
+        self.db_path = os.path.join(self.root_dir, "jobs.sqlite3")
+        self.lease_seconds = lease_seconds
+        os.makedirs(self.root_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation keeps the store safe to use from any thread.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    def workspace_dir(self, job_id: str) -> str:
+        path = os.path.join(self.root_dir, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def create_job(self, params: Dict[str, Any], job_id: Optional[str] = None, worker_id: Optional[str] = None) -> str:
+        """Registers a new job; if `worker_id` is given the job starts leased to that worker."""
+        job_id = job_id or new_job_id()
+        now = time.time()
+        status, lease_expires = (STATUS_RUNNING, now + self.lease_seconds) if worker_id else (STATUS_PENDING, 0)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, params, worker_id, lease_expires, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, json.dumps(params), worker_id, lease_expires, now, now)
+            )
+        self.workspace_dir(job_id)
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            job["stages"] = [r["stage"] for r in conn.execute("SELECT stage FROM stages WHERE job_id = ? ORDER BY updated_at", (job_id,))]
+        return job
+
+    def claim_job(self, job_id: str, worker_id: str, force: bool = False) -> bool:
+        """
+        Leases a job to `worker_id`. Succeeds for pending jobs and for running jobs
+        whose lease has expired; `force` also reopens finished or failed jobs for a rebuild.
+        """
+        now = time.time()
+        claimable = [STATUS_PENDING, STATUS_RUNNING] + ([STATUS_FINISHED, STATUS_FAILED] if force else [])
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = ?, worker_id = ?, lease_expires = ?, updated_at = ? "
+                f"WHERE job_id = ? AND status IN ({','.join('?' * len(claimable))}) AND lease_expires < ?",
+                (STATUS_RUNNING, worker_id, now + self.lease_seconds, now, job_id, *claimable, now)
+            )
+            return cursor.rowcount == 1
+
+    def abandoned_jobs(self) -> List[str]:
+        """Jobs that are pending or running with no live lease (their worker died)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND lease_expires < ? ORDER BY created_at",
+                (STATUS_PENDING, STATUS_RUNNING, time.time())
+            ).fetchall()
+        return [r["job_id"] for r in rows]
+
+    def is_active(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is not None and row["status"] in (STATUS_PENDING, STATUS_RUNNING)
+
+    def is_resumable(self, job_id: str) -> bool:
+        """Unfinished jobs and failed ones (e.g. a .tex fallback), which resume_job can still complete."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row is not None and row["status"] in (STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED)
+
+    def get_stage(self, job_id: str, stage: str, default: Any = None) -> Any:
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM stages WHERE job_id = ? AND stage = ?", (job_id, stage)).fetchone()
+        return json.loads(row["payload"]) if row else default
+
+    @staticmethod
+    def _owner_clause(worker_id: Optional[str]) -> Tuple[str, Tuple[Any, ...]]:
+        return (" AND worker_id = ?", (worker_id,)) if worker_id else ("", ())
+
+    def renew_lease(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease of a running job held by `worker_id`; False if the worker lost it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE job_id = ? AND status = ? AND worker_id = ?",
+                (now + self.lease_seconds, now, job_id, STATUS_RUNNING, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def put_stage(self, job_id: str, stage: str, value: Any, worker_id: Optional[str] = None):
+        """
+        Persists a stage output and renews the job's lease. With `worker_id`, the write
+        is dropped and LeaseLostError raised unless that worker still holds the lease.
+        """
+        now = time.time()
+        owner_sql, owner_args = self._owner_clause(worker_id)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE job_id = ? AND status = ?" + owner_sql,
+                (now + self.lease_seconds, now, job_id, STATUS_RUNNING, *owner_args)
+            )
+            if worker_id and cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                raise LeaseLostError(f"Worker {worker_id} no longer holds job {job_id}; stage '{stage}' was not saved.")
+            conn.execute(
+                "INSERT OR REPLACE INTO stages (job_id, stage, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, json.dumps(value), now)
+            )
+            conn.execute("COMMIT")
+
+    def finish_job(self, job_id: str, status: str, result_path: Optional[str] = None, error: Optional[str] = None,
+                   worker_id: Optional[str] = None) -> bool:
+        """Records a job's outcome. With `worker_id`, only if that worker still holds the job; returns whether it did."""
+        now = time.time()
+        owner_sql, owner_args = self._owner_clause(worker_id)
+        if worker_id:
+            owner_sql += " AND status = ?"
+            owner_args += (STATUS_RUNNING,)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result_path = ?, error = ?, lease_expires = 0, updated_at = ? WHERE job_id = ?" + owner_sql,
+                (status, result_path, error, now, job_id, *owner_args)
+            )
+            return cursor.rowcount == 1
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Deletes the records of finished/failed jobs not updated for `max_age_seconds`."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_FINISHED, STATUS_FAILED, time.time() - max_age_seconds)
+            )
+            pruned = cursor.rowcount
+        if pruned:
+            logger.info("Pruned %s old job records from the job store", pruned)
+        return pruned
+
+class LeaseHeartbeat:
+    """
+    Renews a job's lease from a background thread while its worker is busy in a
+    single long step (a Gemini call, a pdflatex pass), so a slow build is not taken
+    for an abandoned one. `check()` raises LeaseLostError once a renewal fails.
+    """
+
+    def __init__(self, job_store: JobStore, job_id: str, worker_id: str, interval_seconds: Optional[float] = None):
+        self.job_store = job_store
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval_seconds = interval_seconds or job_store.lease_seconds / 3
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                renewed = self.job_store.renew_lease(self.job_id, self.worker_id)
+            except sqlite3.Error as e:
+                # Transient (e.g. a locked database); the lease still has two intervals left.
+                logger.warning("Could not renew the lease of job %s: %s", self.job_id, e)
+                continue
+            if not renewed:
+                logger.warning("Worker %s lost the lease of job %s", self.worker_id, self.job_id)
+                self.lost.set()
+                return
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLostError(f"Worker {self.worker_id} lost the lease of job {self.job_id}.")
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+class StageCache:
+    """Per-job key/value view of the store, handed to stage functions that produce many outputs."""
+
+    def __init__(self, job_store: JobStore, job_id: str, prefix: str, worker_id: Optional[str] = None):
+        self.job_store = job_store
+        self.job_id = job_id
+        self.prefix = prefix
+        self.worker_id = worker_id
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.job_store.get_stage(self.job_id, f"{self.prefix}:{key}", default)
+
+    def put(self, key: str, value: Any):
+        self.job_store.put_stage(self.job_id, f"{self.prefix}:{key}", value, worker_id=self.worker_id)
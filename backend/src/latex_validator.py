@@ -0,0 +1,215 @@
+# backend/src/latex_validator.py
+"""
+Pure-Python checks for LLM-derived LaTeX fragments, run before pdflatex.
+
+A single linear scan tracks brace and environment nesting, skips verbatim
+bodies, and flags what pdflatex would reject under -halt-on-error: unbalanced
+braces/environments, unescaped specials that slipped past
+process_llm_output_for_latex, unknown commands or environments, and unsafe
+\\bibitem keys. The same scan rewrites the fragment into a repaired version;
+fragments that need too many repairs are isolated (reduced to escaped plain
+text) so one bad section cannot break the whole document.
+"""
+
+import os
+import re
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from latex_utils import ESCAPE_MAP
+
+logger = logging.getLogger()
+
+MAX_REPAIRS_PER_FRAGMENT = 25
+
+# Everything the pipeline itself emits, plus common text-mode commands the LLM output may carry.
+KNOWN_COMMANDS = {
+    "section", "subsection", "subsubsection", "paragraph", "textbf", "textit", "texttt", "emph", "underline",
+    "textsuperscript", "textsubscript", "item", "textbackslash", "textasciitilde", "textasciicircum",
+    "textless", "textgreater", "caption", "centering", "textwidth", "appendix", "clearpage", "newpage",
+    "addcontentsline", "par", "noindent", "ldots", "dots", "LaTeX", "TeX", "vspace", "hspace", "footnote",
+    "quad", "qquad", "today", "linebreak", "newline", "bigskip", "medskip", "smallskip", "textendash",
+    "textemdash", "textquotedblleft", "textquotedblright", "textquoteleft", "textquoteright",
+}
+# Commands whose (optional and mandatory) argument is copied as-is: keys, labels, file names, URLs.
+RAW_ARG_COMMANDS = {"bibitem", "label", "ref", "cite", "url", "includegraphics", "input"}
+KNOWN_ENVIRONMENTS = {
+    "itemize", "enumerate", "description", "quote", "quotation", "verbatim", "figure", "center",
+    "thebibliography", "flushleft", "flushright",
+}
+VERBATIM_ENVIRONMENTS = {"verbatim"}
+
+_SPECIAL_RE = re.compile(r'[\\{}&%$#_^]')
+_CONTROL_WORD_RE = re.compile(r'[A-Za-z]+')
+_ENV_ARG_RE = re.compile(r'\s*\{([^{}\\]*)\}')
+_RAW_ARG_RE = re.compile(r'(\s*\[[^\[\]]*\])?\s*\{([^{}]*)\}')
+_UNSAFE_KEY_CHARS_RE = re.compile(r'[^A-Za-z0-9:._-]')
+_COMMAND_RE = re.compile(r'\\[A-Za-z]+\*?|\\(.)')
+
+def _closer(item: str) -> str:
+    return "}" if item == "{" else f"\\end{{{item}}}"
+
+def _scan(text: str, extra_commands: Iterable[str] = (), extra_environments: Iterable[str] = (),
+          allow_comments: bool = False) -> Tuple[str, List[str]]:
+    """Returns (repaired text, issues found). The repaired text is identical when there are no issues."""
+    known_commands = KNOWN_COMMANDS.union(extra_commands)
+    known_environments = KNOWN_ENVIRONMENTS.union(extra_environments)
+    out: List[str] = []
+    issues: List[str] = []
+    stack: List[str] = []  # "{" or environment names, innermost last
+    bib_keys: set = set()
+    i, n = 0, len(text)
+
+    while True:
+        m = _SPECIAL_RE.search(text, i)
+        if m is None:
+            out.append(text[i:])
+            break
+        pos = m.start()
+        out.append(text[i:pos])
+        c = text[pos]
+
+        if c == '\\':
+            word = _CONTROL_WORD_RE.match(text, pos + 1)
+            if word is None:
+                if pos + 1 >= n:
+                    issues.append("trailing backslash")
+                    out.append(ESCAPE_MAP['\\'])
+                    i = n
+                else:
+                    out.append(text[pos:pos + 2])  # control symbol: \%, \{, \\, ...
+                    i = pos + 2
+                continue
+            name, end = word.group(0), word.end()
+
+            if name in ("begin", "end"):
+                arg = _ENV_ARG_RE.match(text, end)
+                env = arg.group(1).strip() if arg else ""
+                if not arg or env not in known_environments:
+                    issues.append(f"unknown or malformed environment in \\{name}{{{env}}}")
+                    i = arg.end() if arg else end  # drop the command, keep the body
+                    continue
+                if name == "begin" and env in VERBATIM_ENVIRONMENTS:
+                    end_tag = f"\\end{{{env}}}"
+                    close = text.find(end_tag, arg.end())
+                    if close == -1:
+                        issues.append(f"unclosed {env} environment")
+                        out.append(text[pos:] + "\n" + end_tag)
+                        i = n
+                    else:
+                        out.append(text[pos:close + len(end_tag)])
+                        i = close + len(end_tag)
+                    continue
+                if name == "begin":
+                    stack.append(env)
+                    out.append(text[pos:arg.end()])
+                elif env not in stack:
+                    issues.append(f"\\end{{{env}}} without matching \\begin")
+                else:
+                    while stack[-1] != env:
+                        top = stack.pop()
+                        issues.append(f"unclosed {'brace' if top == '{' else top} before \\end{{{env}}}")
+                        out.append(_closer(top))
+                    stack.pop()
+                    out.append(text[pos:arg.end()])
+                i = arg.end()
+                continue
+
+            if name in RAW_ARG_COMMANDS:
+                arg = _RAW_ARG_RE.match(text, end)
+                if arg:
+                    value = arg.group(2)
+                    if name == "bibitem":
+                        key = _UNSAFE_KEY_CHARS_RE.sub('', value) or f"ref{len(bib_keys) + 1}"
+                        if key != value:
+                            issues.append(f"unsafe bibitem key '{value}'")
+                        if key in bib_keys:
+                            issues.append(f"duplicate bibitem key '{key}'")
+                            while key in bib_keys:
+                                key += "x"
+                        bib_keys.add(key)
+                        value = key
+                    out.append(f"\\{name}{arg.group(1) or ''}{{{value}}}")
+                    i = arg.end()
+                    continue
+
+            if name not in known_commands and name not in RAW_ARG_COMMANDS:
+                issues.append(f"unknown command \\{name}")
+                out.append(ESCAPE_MAP['\\'] + name)
+            else:
+                out.append(text[pos:end])
+            i = end
+            continue
+
+        if c == '{':
+            stack.append('{')
+            out.append(c)
+        elif c == '}':
+            if '{' not in stack:
+                issues.append("unmatched closing brace")
+                out.append(ESCAPE_MAP['}'])
+            else:
+                while stack[-1] != '{':
+                    top = stack.pop()
+                    issues.append(f"unclosed {top} environment before closing brace")
+                    out.append(_closer(top))
+                stack.pop()
+                out.append(c)
+        elif c == '%' and allow_comments:
+            line_end = text.find('\n', pos)
+            line_end = n if line_end == -1 else line_end
+            out.append(text[pos:line_end])
+            i = line_end
+            continue
+        else:
+            issues.append(f"unescaped special character '{c}'")
+            out.append(ESCAPE_MAP[c])
+        i = pos + 1
+
+    while stack:
+        top = stack.pop()
+        issues.append(f"unclosed {'brace' if top == '{' else top + ' environment'} at end of fragment")
+        out.append(_closer(top))
+
+    return "".join(out), issues
+
+def validate_fragment(text: str, **options) -> List[str]:
+    """Returns the problems pdflatex would trip over in `text` (empty list when it is safe)."""
+    return _scan(text, **options)[1]
+
+def _isolate(text: str) -> str:
+    # Strip commands and grouping, then escape every special character: plain text always compiles.
+    plain = _COMMAND_RE.sub(lambda m: m.group(1) or " ", text).replace("{", "").replace("}", "")
+    escaped = "".join(ESCAPE_MAP.get(ch, ch) for ch in plain)
+    return f"\\textit{{(This content could not be typeset and is shown as plain text.)}}\n\n{escaped}"
+
+def repair_fragment(text: str, name: str = "fragment", **options) -> str:
+    """
+    Returns a version of `text` that is safe to hand to pdflatex. Small problems
+    are repaired in place; a fragment needing more than MAX_REPAIRS_PER_FRAGMENT
+    fixes is isolated as escaped plain text. `options` extend the accepted
+    commands/environments and allow % comments for trusted templates.
+    """
+    if not text:
+        return text
+    repaired, issues = _scan(text, **options)
+    if not issues:
+        return text
+    if len(issues) > MAX_REPAIRS_PER_FRAGMENT:
+        logger.warning("Isolating %s: %s LaTeX problems (first: %s)", name, len(issues), issues[0])
+        return _isolate(text)
+    logger.warning("Repaired %s LaTeX problem(s) in %s: %s", len(issues), name, "; ".join(issues[:5]))
+    return repaired
+
+def repair_file(path: str, name: Optional[str] = None, **options) -> bool:
+    """Validates a .tex fragment on disk and rewrites it if it needed repairs. Returns True if it changed."""
+    if not os.path.exists(path):
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    repaired = repair_fragment(text, name or os.path.basename(path), **options)
+    if repaired == text:
+        return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(repaired)
+    return True
@@ -0,0 +1,121 @@
+# backend/src/log_config.py
+"""
+One-time logging setup shared by the API and the CLIs.
+
+Every record goes through a single QueueHandler on the root logger; a
+QueueListener thread does the formatting for the console and the JSON log
+file, so request threads never block on disk I/O. Each record carries the
+`report_id` of the report being built (a context variable set by the
+orchestrator), which keeps the logs of concurrent builds apart.
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterator, Optional
+
+try:
+    import colorlog
+except ImportError:
+    colorlog = None
+
+report_id_var: contextvars.ContextVar = contextvars.ContextVar("report_id", default="-")
+
+_listener: Optional[QueueListener] = None
+
+_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(report_id)s] [%(filename)s:%(lineno)d] - %(message)s'
+
+def new_report_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def get_report_id() -> str:
+    return report_id_var.get()
+
+@contextmanager
+def log_context(report_id: str) -> Iterator[str]:
+    """Tags every log record emitted in this context (and this thread) with `report_id`."""
+    token = report_id_var.set(report_id)
+    try:
+        yield report_id
+    finally:
+        report_id_var.reset(token)
+
+class ReportIdFilter(logging.Filter):
+    # Runs in the emitting thread, where the context variable is still visible.
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "report_id"):
+            record.report_id = report_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "report_id": getattr(record, "report_id", "-"),
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+def _console_handler() -> logging.Handler:
+    if colorlog is not None:
+        handler = colorlog.StreamHandler(sys.stdout)
+        handler.setFormatter(colorlog.ColoredFormatter(
+            fmt='%(log_color)s' + _TEXT_FORMAT,
+            log_colors={
+                'DEBUG':    'cyan',
+                'INFO':     'green',
+                'WARNING':  'yellow',
+                'ERROR':    'red',
+                'CRITICAL': 'bold_red',
+            }
+        ))
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(_TEXT_FORMAT))
+    return handler
+
+def setup_logging(level: Optional[str] = None, log_file: Optional[str] = "api_report_generator.log") -> None:
+    """
+    Routes all logging through a queue to a console handler and, optionally, a
+    JSON-lines file. Safe to call more than once; only the first call configures.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level_name = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_level = getattr(logging, level_name, logging.INFO)
+
+    handlers = [_console_handler()]
+    if log_file:
+        file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(ReportIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(log_level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
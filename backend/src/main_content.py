@@ -1,48 +1,114 @@
 import logging
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from latex_utils import process_llm_output_for_latex, escape_latex_special_chars, clean_title_for_latex_command
-import time
+from latex_validator import repair_fragment
+from model_router import TASK_SECTION, is_failed_generation
+from profiling import span, traced_sleep
 logger = logging.getLogger()
 
-def generate_section_content(section_title: str, full_query: str, from_generator_func) -> str:
+# Rendered user figure width as a fraction of \textwidth (also used to size the normalized image).
+USER_FIGURE_WIDTH_FRACTION = 0.8
+
+def generate_section_markdown(section_title: str, full_query: str, from_generator_func) -> Optional[str]:
+    """Asks the LLM for a section's body as raw markdown; returns None if the call failed."""
     prompt = f"""You are an academic writer for a LaTeX report on: "{full_query}". Write the content for the section: "{section_title}".
 INSTRUCTIONS: Use simple markdown for formatting (`**bold**`, `*italic*`, `- list item`). DO NOT use any raw LaTeX commands. Write only the body text."""
     try:
-        raw_output = from_generator_func(prompt)
-        return process_llm_output_for_latex(raw_output)
+        return from_generator_func(prompt, task=TASK_SECTION)
     except Exception as e:
-        logger.error(f"Error generating content for section '{section_title}': {e}")
+        logger.error("Error generating content for section '%s': %s", section_title, e)
+        return None
+
+def section_markdown_to_latex(raw_markdown: Optional[str], section_title: str) -> str:
+    if raw_markdown is None:
         return f"\\textbf{{Error: Could not generate content for this section.}}"
+    return repair_fragment(process_llm_output_for_latex(raw_markdown), f"section '{section_title}'")
+
+def generate_section_content(section_title: str, full_query: str, from_generator_func) -> str:
+    return section_markdown_to_latex(generate_section_markdown(section_title, full_query, from_generator_func), section_title)
 
 def generate_user_figure_latex(basename: str, caption: str) -> str:
     escaped_caption = escape_latex_special_chars(caption or "User-provided figure.")
     safe_label = re.sub(r'[^a-zA-Z0-9]', '', basename)[:20]
     return f"""\\begin{{figure}}[htbp] \\centering
-    \\includegraphics[width=0.8\\textwidth,keepaspectratio]{{{basename}}}
+    \\includegraphics[width={USER_FIGURE_WIDTH_FRACTION}\\textwidth,keepaspectratio]{{{basename}}}
     \\caption{{{escaped_caption}}} \\label{{fig:{safe_label}}}
 \\end{{figure}}"""
 
-def generate_main_content(sections: List[Dict[str, Any]], query: str, output_file: str, from_generator_func, use_rag: bool, user_figure_basename: Optional[str], user_figure_caption: Optional[str]):
-    all_content = []
-    if user_figure_basename:
-        all_content.append(generate_user_figure_latex(user_figure_basename, user_figure_caption))
-
-    for section in sections:
+def iter_section_titles(sections: List[Dict[str, Any]]) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Yields (key, section title, subsection title or None) in document order; keys are "i" and "i.j"."""
+    for sec_idx, section in enumerate(sections):
         title = section.get("title")
         if not title: continue
-        
         cleaned_title = clean_title_for_latex_command(title)
-        all_content.append(f"\\section{{{escape_latex_special_chars(cleaned_title)}}}")
-        all_content.append(generate_section_content(cleaned_title, query, from_generator_func))
-        time.sleep(2.0)
-        for sub_item in section.get("subsections", []):
+        yield str(sec_idx), cleaned_title, None
+        for sub_idx, sub_item in enumerate(section.get("subsections", [])):
             sub_title = sub_item.get("title") if isinstance(sub_item, dict) else sub_item
             if not sub_title or not isinstance(sub_title, str): continue
-            
-            cleaned_sub_title = clean_title_for_latex_command(sub_title)
-            all_content.append(f"\\subsection{{{escape_latex_special_chars(cleaned_sub_title)}}}")
-            all_content.append(generate_section_content(f"{cleaned_title} - {cleaned_sub_title}", query, from_generator_func))
+            yield f"{sec_idx}.{sub_idx}", cleaned_title, clean_title_for_latex_command(sub_title)
+
+def _cached_section_markdown(key: str, section_title: str, full_query: str, from_generator_func, fragment_cache, semantic_cache=None) -> Tuple[Optional[str], bool]:
+    """Returns (markdown, generated) where `generated` is False when the markdown came from a cache."""
+    if fragment_cache is not None:
+        cached = fragment_cache.get(key)
+        if cached is not None:
+            logger.info("Reusing stored markdown for section '%s'", section_title)
+            return cached, False
+    content, generated = None, False
+    if semantic_cache is not None:
+        with span("semantic cache lookup", "retrieval") as span_args:
+            content = semantic_cache.lookup(full_query, section_title)
+            span_args["hit"] = content is not None
+    if content is None:
+        content, generated = generate_section_markdown(section_title, full_query, from_generator_func), True
+    # Failed generations are not stored, so a resumed run retries them.
+    if content is not None and not is_failed_generation(content):
+        if fragment_cache is not None:
+            fragment_cache.put(key, content)
+        if semantic_cache is not None and generated:
+            semantic_cache.add(full_query, section_title, content)
+    return content, generated
+
+def collect_section_markdown(sections: List[Dict[str, Any]], query: str, from_generator_func, fragment_cache=None, semantic_cache=None) -> Dict[str, Optional[str]]:
+    """
+    Generates the raw markdown of every section and subsection, keyed like
+    iter_section_titles. If `fragment_cache` (an object with get/put, e.g. a
+    job_store.StageCache) is given, each section is stored as soon as it is
+    generated and reused on a later run instead of calling the model again.
+    A `semantic_cache` (semantic_cache.SemanticCache) additionally serves
+    sections already written for a near-duplicate query.
+    """
+    section_markdown = {}
+    for key, title, sub_title in iter_section_titles(sections):
+        prompt_title = title if sub_title is None else f"{title} - {sub_title}"
+        with span(f"section {key}", "section", title=prompt_title) as span_args:
+            content, generated = _cached_section_markdown(key, prompt_title, query, from_generator_func, fragment_cache, semantic_cache)
+            span_args["generated"] = generated
+        section_markdown[key] = content
+        if generated and sub_title is None:
+            traced_sleep(2.0, "section pacing")
+    return section_markdown
+
+def generate_main_content(sections: List[Dict[str, Any]], query: str, output_file: str, from_generator_func, use_rag: bool, user_figure_basename: Optional[str], user_figure_caption: Optional[str], fragment_cache=None, section_markdown: Optional[Dict[str, Optional[str]]] = None):
+    """
+    Writes the report body. `section_markdown` is the output of collect_section_markdown
+    when the caller already has it; otherwise it is collected here (using `fragment_cache`).
+    """
+    if section_markdown is None:
+        section_markdown = collect_section_markdown(sections, query, from_generator_func, fragment_cache)
+
+    all_content = []
+    if user_figure_basename:
+        all_content.append(generate_user_figure_latex(user_figure_basename, user_figure_caption))
+
+    for key, title, sub_title in iter_section_titles(sections):
+        if sub_title is None:
+            all_content.append(f"\\section{{{escape_latex_special_chars(title)}}}")
+            all_content.append(section_markdown_to_latex(section_markdown.get(key), title))
+        else:
+            all_content.append(f"\\subsection{{{escape_latex_special_chars(sub_title)}}}")
+            all_content.append(section_markdown_to_latex(section_markdown.get(key), f"{title} - {sub_title}"))
 
     with open(output_file, "w", encoding="utf-8") as f: f.write("\n\n".join(all_content))
-    logger.info(f"Main content successfully written to {output_file}")
\ No newline at end of file
+    logger.info("Main content successfully written to %s", output_file)
@@ -0,0 +1,167 @@
+# backend/src/model_router.py
+"""
+Latency-aware routing of Gemini calls across model tiers.
+
+Every call site declares a task type. Each task has an ordered list of tiers
+(short structured tasks prefer a fast/lite model, section prose the main model)
+and the router picks the first tier whose model currently meets its SLOs: an
+EWMA of latency for that task and an EWMA of the model's error rate. A model
+that breaks an SLO is skipped until a periodic probe shows it has recovered.
+
+Configuration (environment):
+    GEMINI_TIERS         ordered "tier=model" pairs, default "fast=gemini-2.0-flash-lite,main=$GEMINI_MODEL"
+    GEMINI_ROUTE_<TASK>  tier order for one task, e.g. GEMINI_ROUTE_SECTION="main,fast"
+    GEMINI_SLO_<TASK>_SECONDS, GEMINI_SLO_ERROR_RATE, GEMINI_ROUTER_PROBE_SECONDS
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger()
+
+TASK_TOC = "toc"
+TASK_SECTION = "section"
+TASK_BIBLIOGRAPHY = "bibliography"
+TASK_APPENDIX_DECISION = "appendix_decision"
+TASK_APPENDIX = "appendix"
+TASK_REPAIR = "repair"
+
+# call_gemini reports a failed call by returning a string with this prefix instead of raising.
+GENERATION_ERROR_PREFIX = "Error:"
+
+def is_failed_generation(value: Any) -> bool:
+    """True for call_gemini's "Error: ..." responses, which must never be parsed, repaired or stored."""
+    return isinstance(value, str) and value.startswith(GENERATION_ERROR_PREFIX)
+TASK_TYPES = (TASK_TOC, TASK_SECTION, TASK_BIBLIOGRAPHY, TASK_APPENDIX_DECISION, TASK_APPENDIX, TASK_REPAIR)
+
+DEFAULT_TIERS = f"fast=gemini-2.0-flash-lite,main={os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')}"
+DEFAULT_ROUTES = {
+    TASK_TOC: ("fast", "main"),
+    TASK_SECTION: ("main", "fast"),
+    TASK_BIBLIOGRAPHY: ("fast", "main"),
+    TASK_APPENDIX_DECISION: ("fast", "main"),
+    TASK_APPENDIX: ("main", "fast"),
+    TASK_REPAIR: ("fast", "main"),
+}
+# Per-task latency SLOs (seconds); prose takes far longer than a YES/NO answer.
+DEFAULT_LATENCY_SLO_SECONDS = {
+    TASK_TOC: 20.0,
+    TASK_SECTION: 60.0,
+    TASK_BIBLIOGRAPHY: 30.0,
+    TASK_APPENDIX_DECISION: 10.0,
+    TASK_APPENDIX: 60.0,
+    TASK_REPAIR: 20.0,
+}
+GEMINI_SLO_ERROR_RATE = float(os.getenv("GEMINI_SLO_ERROR_RATE", "0.25"))
+GEMINI_ROUTER_EWMA_ALPHA = float(os.getenv("GEMINI_ROUTER_EWMA_ALPHA", "0.2"))
+GEMINI_ROUTER_PROBE_SECONDS = float(os.getenv("GEMINI_ROUTER_PROBE_SECONDS", "60"))
+
+def parse_tiers(spec: str) -> Dict[str, str]:
+    """Parses "tier=model,tier=model" into an ordered {tier: model} dict."""
+    tiers = {}
+    for item in spec.split(","):
+        tier, sep, model_name = item.partition("=")
+        if not sep or not tier.strip() or not model_name.strip():
+            raise ValueError(f"Invalid GEMINI_TIERS entry: '{item}' (expected tier=model)")
+        tiers[tier.strip()] = model_name.strip()
+    return tiers
+
+class ModelRouter:
+    def __init__(
+        self, tiers: Dict[str, str], routes: Dict[str, Tuple[str, ...]], latency_slo: Dict[str, float],
+        error_rate_slo: float = GEMINI_SLO_ERROR_RATE, alpha: float = GEMINI_ROUTER_EWMA_ALPHA,
+        probe_seconds: float = GEMINI_ROUTER_PROBE_SECONDS
+    ):
+        if not tiers:
+            raise ValueError("ModelRouter needs at least one tier.")
+        self.tiers = dict(tiers)
+        # Routes may only name configured tiers; a task with none left uses the first tier.
+        self.routes = {task: [t for t in order if t in self.tiers] or [next(iter(self.tiers))] for task, order in routes.items()}
+        self.latency_slo = dict(latency_slo)
+        self.error_rate_slo = error_rate_slo
+        self.alpha = alpha
+        self.probe_seconds = probe_seconds
+        self._lock = threading.Lock()
+        self._error_rate: Dict[str, float] = {}
+        self._latency: Dict[Tuple[str, str], float] = {}
+        self._next_probe: Dict[str, float] = {}
+        self._probing: Dict[str, str] = {}
+        self._calls: Dict[str, int] = {}
+        self._last_choice: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        tiers = parse_tiers(os.getenv("GEMINI_TIERS", DEFAULT_TIERS))
+        routes, latency_slo = {}, {}
+        for task in TASK_TYPES:
+            route_env = os.getenv(f"GEMINI_ROUTE_{task.upper()}")
+            routes[task] = tuple(t.strip() for t in route_env.split(",")) if route_env else DEFAULT_ROUTES[task]
+            latency_slo[task] = float(os.getenv(f"GEMINI_SLO_{task.upper()}_SECONDS", str(DEFAULT_LATENCY_SLO_SECONDS[task])))
+        return cls(tiers, routes, latency_slo)
+
+    def _breach(self, model_name: str, task: str) -> Optional[str]:
+        """Returns why `model_name` currently breaks an SLO for `task`, or None if it is healthy."""
+        error_rate = self._error_rate.get(model_name, 0.0)
+        if error_rate > self.error_rate_slo:
+            return f"error rate {error_rate:.0%}"
+        latency = self._latency.get((model_name, task))
+        slo = self.latency_slo.get(task)
+        if latency is not None and slo is not None and latency > slo:
+            return f"latency {latency:.1f}s > {slo:.0f}s"
+        return None
+
+    def choose(self, task: str) -> str:
+        """Returns the model for the next `task` call: the first tier meeting its SLOs, else the preferred one."""
+        order = self.routes.get(task) or self.routes[TASK_SECTION]
+        now = time.monotonic()
+        with self._lock:
+            chosen, reasons = None, []
+            for tier in order:
+                model_name = self.tiers[tier]
+                breach = self._breach(model_name, task)
+                if breach is None:
+                    chosen = model_name
+                    break
+                # A breaching model still gets one probe request per interval so it can recover.
+                if now >= self._next_probe.setdefault(model_name, now + self.probe_seconds):
+                    self._next_probe[model_name] = now + self.probe_seconds
+                    self._probing[model_name] = task
+                    logger.info("Probing model %s for %s despite %s", model_name, task, breach)
+                    chosen = model_name
+                    break
+                reasons.append(f"{tier} ({model_name}): {breach}")
+            if chosen is None:
+                chosen = self.tiers[order[0]]
+            previous = self._last_choice.get(task)
+            self._last_choice[task] = chosen
+        if previous is not None and previous != chosen:
+            logger.warning("Routing %s calls from %s to %s%s", task, previous, chosen, f" ({'; '.join(reasons)})" if reasons else "")
+        return chosen
+
+    def record(self, model_name: str, task: str, latency_seconds: Optional[float], ok: bool):
+        """Feeds one attempt's outcome into the model's EWMAs (latency only for successful attempts)."""
+        key = (model_name, task)
+        with self._lock:
+            self._calls[model_name] = self._calls.get(model_name, 0) + 1
+            # A probe's outcome replaces the averages: the model is judged on how it behaves now.
+            a = 1.0 if self._probing.pop(model_name, None) == task else self.alpha
+            self._error_rate[model_name] = (1 - a) * self._error_rate.get(model_name, 0.0) + a * (0.0 if ok else 1.0)
+            if ok and latency_seconds is not None:
+                previous = self._latency.get(key)
+                self._latency[key] = latency_seconds if previous is None else (1 - a) * previous + a * latency_seconds
+            if self._breach(model_name, task) is None:
+                self._next_probe.pop(model_name, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                model_name: {
+                    "calls": self._calls.get(model_name, 0),
+                    "error_rate": round(self._error_rate.get(model_name, 0.0), 3),
+                    "latency": {task: round(v, 2) for (m, task), v in self._latency.items() if m == model_name},
+                }
+                for model_name in self.tiers.values()
+            }
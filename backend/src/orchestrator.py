@@ -2,94 +2,348 @@ import os
 import logging
 import subprocess
 import re
-import shutil
+import threading
 import time
-from typing import List, Optional, Dict, Any
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Callable, Iterator, Tuple
 
 from latex_utils import escape_latex_special_chars
-from cover import generate_cover_page
-from toc import generate_toc_from_query
-from main_content import generate_main_content
-from supplementary import generate_bibliography, generate_appendices
-from generator import call_gemini
+from cover import generate_cover_page, LOGO_WIDTH_FRACTION, COVER_LATEX_COMMANDS, COVER_LATEX_ENVIRONMENTS
+from toc import generate_toc_from_query, FallbackToc
+from main_content import generate_main_content, collect_section_markdown, USER_FIGURE_WIDTH_FRACTION
+from supplementary import request_bibliography, write_bibliography, request_appendices, write_appendices, decide_appendices
+from generator import call_gemini, log_latency_stats
+from assets import link_into_workspace
+from images import normalize_image
+from log_config import log_context, new_report_id
+from job_store import JobStore, StageCache, LeaseHeartbeat, LeaseLostError, STATUS_FINISHED, STATUS_FAILED, new_worker_id
+from latex_validator import repair_file
+from preview import write_preview, OUTPUT_FORMATS, OUTPUT_FORMAT_PDF, PREVIEW_EXTENSIONS
+from semantic_cache import get_semantic_cache
+from pdf_postprocess import optimize_pdf
+from profiling import profiling, span
+from model_router import GENERATION_ERROR_PREFIX, is_failed_generation
 import logging
 
 logger = logging.getLogger()
 
+# Bounded pool of concurrent pdflatex processes shared by every ReportGenerator in
+# the process. pdflatex is CPU and disk heavy, so it gets its own limit separate
+# from the Gemini concurrency budget.
+PDFLATEX_MAX_PROCESSES = max(1, int(os.getenv("PDFLATEX_MAX_PROCESSES", str(os.cpu_count() or 2))))
+_pdflatex_slots = threading.BoundedSemaphore(PDFLATEX_MAX_PROCESSES)
+
+# pdflatex by-products that are only needed between passes.
+LATEX_INTERMEDIATE_EXTENSIONS = (".aux", ".log", ".toc", ".out")
+
+_MISSING = object()
+
+
+def job_output_base(output_dir: str, job_id: str) -> str:
+    """Output path, without extension, of a job's report and its trace files."""
+    return os.path.join(output_dir, f"{job_id}_report")
+
 class ReportGenerator:
-    def __init__(self, output_dir: str = "build", temp_dir_name: str = "api_orchestrator_temp", use_rag: bool = True):
+    def __init__(self, output_dir: str = "build", temp_dir_name: str = "api_orchestrator_temp", use_rag: bool = True, job_store: Optional[JobStore] = None):
         self.output_dir = os.path.abspath(output_dir)
-        self.temp_dir = os.path.join(self.output_dir, temp_dir_name)
         self.use_rag = use_rag
-        
+        self.job_store = job_store
+        self._worker_id: Optional[str] = None
+        self._lease: Optional[LeaseHeartbeat] = None
+        self._set_workspace(os.path.join(self.output_dir, temp_dir_name))
+        logger.info("ReportGenerator initialized. RAG enabled: %s. Temp Dir: %s", self.use_rag, self.temp_dir)
+
+    def _set_workspace(self, temp_dir: str):
+        self.temp_dir = temp_dir
         os.makedirs(self.temp_dir, exist_ok=True)
 
         self.cover_path = os.path.join(self.temp_dir, "cover.tex")
         self.main_content_path = os.path.join(self.temp_dir, "main_content.tex")
         self.bibliography_path = os.path.join(self.temp_dir, "bibliography.tex")
         self.appendices_path = os.path.join(self.temp_dir, "appendices.tex")
-        logger.info(f"ReportGenerator initialized. RAG enabled: {self.use_rag}. Temp Dir: {self.temp_dir}")
 
     def _get_safe_filename(self, title: str) -> str:
         safe = re.sub(r'[^\w\s-]', '', title).strip()
         return re.sub(r'[-\s]+', '-', safe).lower() or "report"
 
+    def _output_base(self, report_title: str, job_id: Optional[str]) -> str:
+        """Output path without extension. A job's outputs are named after its id, not its title."""
+        # Concurrent jobs with the same title must never share pdflatex's jobname (.aux/.log/.pdf)
+        # or each other's result files; the title only becomes the download name.
+        if job_id:
+            return job_output_base(self.output_dir, job_id)
+        return os.path.join(self.output_dir, f"{self._get_safe_filename(report_title)}_report")
+
+    def _check_lease(self):
+        """Aborts the build (LeaseLostError) once another worker has taken over its job."""
+        if self._lease is not None:
+            self._lease.check()
+
+    def _stage(self, job_id: Optional[str], name: str, produce: Callable[[], Any],
+               persist: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Runs `produce` unless the job store already holds this stage's output; persists new outputs.
+        A failed generation ("Error: ..."), or an output `persist` rejects, is not stored, so a
+        resumed run retries the stage; a failed generation is returned as None.
+        """
+        with span(name, "stage") as span_args:
+            if job_id:
+                stored = self.job_store.get_stage(job_id, name, _MISSING)
+                if stored is not _MISSING:
+                    logger.info("Stage '%s' restored from the job store.", name)
+                    span_args["restored"] = True
+                    return stored
+            self._check_lease()
+            value = produce()
+            if is_failed_generation(value):
+                logger.warning("Stage '%s' failed (%s); it is not saved and will be retried on resume.", name, value)
+                span_args["failed"] = True
+                return None
+            if job_id and (persist is None or persist(value)):
+                self.job_store.put_stage(job_id, name, value, worker_id=self._worker_id)
+            return value
+
+    def _relink_missing_assets(self, job_id: str, assets: Dict[str, Optional[str]],
+                               link_assets: Callable[[], Dict[str, Optional[str]]]) -> Dict[str, Optional[str]]:
+        """
+        Links the uploads again when the job's workspace lost them (the build janitor evicted a
+        finished job that is now resumed, e.g. for its PDF). Raises RuntimeError if an upload
+        is no longer stored either, instead of building a report with a missing image.
+        """
+        missing = [kind for kind, name in assets.items() if name and not os.path.exists(os.path.join(self.temp_dir, name))]
+        if not missing:
+            return assets
+        logger.warning("Workspace of job %s lost its %s; linking the uploads again.", job_id, ", ".join(missing))
+        relinked = link_assets()
+        lost = [kind for kind in missing if not relinked.get(kind)]
+        if lost:
+            raise RuntimeError(
+                f"The workspace of job {job_id} was removed and its uploaded {', '.join(lost)} is no longer "
+                f"stored; the job cannot be resumed, generate the report again."
+            )
+        self.job_store.put_stage(job_id, "assets", relinked, worker_id=self._worker_id)
+        return relinked
+
+    @staticmethod
+    def _request_or_error(request: Callable[..., str], *args) -> str:
+        """Runs `request`, turning an exception into a failed-generation result, which _stage never stores."""
+        try:
+            return request(*args)
+        except Exception as e:
+            logger.error("%s failed: %s", request.__name__, e)
+            return f"{GENERATION_ERROR_PREFIX} {request.__name__} failed: {e}"
+
+    def _file_stage(self, job_id: Optional[str], name: str, path: str, produce: Callable[[], Optional[str]]) -> Optional[str]:
+        """Like _stage for generators that write `path`; the file's text is what gets stored and restored."""
+        def _produce_text() -> Optional[str]:
+            if produce() is None:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+
+        text = self._stage(job_id, name, _produce_text)
+        if text is None:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def _claim_job(self, job_id: str, params: Dict[str, Any]):
+        worker_id = new_worker_id()
+        if self.job_store.get_job(job_id) is None:
+            self.job_store.create_job(params, job_id=job_id, worker_id=worker_id)
+        elif not self.job_store.claim_job(job_id, worker_id, force=True):
+            raise RuntimeError(f"Job {job_id} is being built by another worker.")
+        self._worker_id = worker_id
+        self._set_workspace(self.job_store.workspace_dir(job_id))
+
     def generate_report(
         self, query: str, report_title: str, authors: List[str], date: str,
         mentors: Optional[List[str]], university: Optional[str], logo_path: Optional[str],
-        primary_color: str, user_figure_path: Optional[str], user_figure_caption: Optional[str]
+        primary_color: str, user_figure_path: Optional[str], user_figure_caption: Optional[str],
+        report_id: Optional[str] = None, job_id: Optional[str] = None, output_format: str = OUTPUT_FORMAT_PDF,
+        profile: Optional[str] = None
     ) -> str:
-        safe_filename = self._get_safe_filename(report_title)
-        final_tex_path = os.path.join(self.output_dir, f"{safe_filename}_report.tex")
-        final_pdf_path = os.path.join(self.output_dir, f"{safe_filename}_report.pdf")
-
-        # Copy assets to the compilation directory
-        local_logo_path = None
-        if logo_path and os.path.exists(logo_path):
-            basename = os.path.basename(logo_path)
-            local_logo_path = os.path.join(self.temp_dir, basename)
-            shutil.copy2(logo_path, local_logo_path)
-
-        user_figure_basename = None
-        if user_figure_path and os.path.exists(user_figure_path):
-            basename = os.path.basename(user_figure_path)
-            shutil.copy2(user_figure_path, os.path.join(self.temp_dir, basename))
-            user_figure_basename = basename
+        """
+        Builds the report and returns the PDF path (or the .tex path if compilation fails).
+        With output_format "html" or "markdown" no LaTeX is produced and the preview's
+        path is returned instead.
+        With a job store and a `job_id`, every stage output is persisted as it completes
+        and a repeated call with the same `job_id` resumes from the last completed stage,
+        so a previewed job can later be built as a PDF without calling the model again.
+        `profile` ("trace" or "cprofile", see profiling.py) writes a performance trace of
+        this build next to its output.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        build_id = report_id or job_id or new_report_id()
+        output_base = self._output_base(report_title, job_id)
+        # Every log line of this build (including call_gemini's) carries the report id.
+        with log_context(build_id), profiling(build_id, profile, output_base):
+            if job_id and self.job_store is None:
+                raise ValueError("A job_id requires a ReportGenerator with a job_store.")
+            if job_id:
+                self._claim_job(job_id, {
+                    "output_dir": self.output_dir, "use_rag": self.use_rag,
+                    "query": query, "report_title": report_title, "authors": authors, "date": date,
+                    "mentors": mentors, "university": university, "logo_path": logo_path,
+                    "primary_color": primary_color, "user_figure_path": user_figure_path,
+                    "user_figure_caption": user_figure_caption, "output_format": output_format,
+                })
+            try:
+                # The heartbeat keeps the lease alive through single steps (a Gemini call, a
+                # pdflatex pass) that can outlast it; stage writes renew it as well.
+                with span("generate_report", "report", output_format=output_format, job_id=job_id), \
+                        self._lease_heartbeat(job_id):
+                    final_path = self._run_pipeline(
+                        job_id, query, report_title, authors, date, mentors, university, logo_path,
+                        primary_color, user_figure_path, user_figure_caption, output_format
+                    )
+            except LeaseLostError as e:
+                logger.warning("Abandoning the build of job %s: %s", job_id, e)
+                raise
+            except Exception as e:
+                if job_id:
+                    self.job_store.finish_job(job_id, STATUS_FAILED, error=str(e), worker_id=self._worker_id)
+                raise
+            finally:
+                log_latency_stats()
+            if job_id:
+                # A .tex fallback means compilation failed; the job stays resumable via resume_job.
+                status = STATUS_FAILED if final_path.endswith('.tex') else STATUS_FINISHED
+                if not self.job_store.finish_job(job_id, status, result_path=final_path, worker_id=self._worker_id):
+                    raise LeaseLostError(f"Job {job_id} was taken over by another worker before it finished.")
+            return final_path
+
+    @contextmanager
+    def _lease_heartbeat(self, job_id: Optional[str]) -> Iterator[None]:
+        if not job_id:
+            yield
+            return
+        with LeaseHeartbeat(self.job_store, job_id, self._worker_id) as lease:
+            self._lease = lease
+            try:
+                yield
+            finally:
+                self._lease = None
+
+    def _run_pipeline(
+        self, job_id: Optional[str], query: str, report_title: str, authors: List[str], date: str,
+        mentors: Optional[List[str]], university: Optional[str], logo_path: Optional[str],
+        primary_color: str, user_figure_path: Optional[str], user_figure_caption: Optional[str],
+        output_format: str = OUTPUT_FORMAT_PDF
+    ) -> str:
+        output_base = self._output_base(report_title, job_id)
+        final_tex_path = output_base + ".tex"
+        final_pdf_path = output_base + ".pdf"
+
+        def _link_assets() -> Dict[str, Optional[str]]:
+            # Downsize uploads to their rendered size, then link them into the
+            # compilation directory (hard link or symlink, no copy)
+            linked = {"logo": None, "user_figure": None}
+            if logo_path and os.path.exists(logo_path):
+                logo_source = normalize_image(logo_path, LOGO_WIDTH_FRACTION)
+                linked["logo"] = os.path.basename(link_into_workspace(logo_source, self.temp_dir))
+            if user_figure_path and os.path.exists(user_figure_path):
+                figure_source = normalize_image(user_figure_path, USER_FIGURE_WIDTH_FRACTION)
+                linked["user_figure"] = os.path.basename(link_into_workspace(figure_source, self.temp_dir))
+            return linked
+
+        # The linked files live in the job workspace, so a resumed job no longer needs the uploads.
+        assets = self._stage(job_id, "assets", _link_assets)
+        if job_id:
+            assets = self._relink_missing_assets(job_id, assets, _link_assets)
+        local_logo_path = os.path.join(self.temp_dir, assets["logo"]) if assets["logo"] else None
+        user_figure_basename = assets["user_figure"]
 
         logger.info("Step 1: Generating TOC...")
-        sections = generate_toc_from_query(query, call_gemini)
-        
-        logger.info("Step 2: Generating Cover...")
-        generate_cover_page(
-            report_title=report_title, authors=authors, date=date, mentors=mentors or [],
-            university=university, logo_path=local_logo_path,
-            primary_color=primary_color,
-            output_path=self.cover_path, main_tex_output_dir=self.output_dir
-        )
-
-        logger.info("Step 3: Generating Main Content...")
-        generate_main_content(
-            sections=sections, query=query, output_file=self.main_content_path,
-            from_generator_func=call_gemini, use_rag=self.use_rag,
-            user_figure_basename=user_figure_basename, user_figure_caption=user_figure_caption
-        )
-        
-        logger.info("Step 4: Generating Bibliography...")
-        generate_bibliography(query, sections, self.bibliography_path, call_gemini)
-        
-        logger.info("Step 5: Generating Appendices...")
-        has_appendices = generate_appendices(query, sections, self.appendices_path, call_gemini) is not None
+        sections = self._stage(job_id, "toc", lambda: generate_toc_from_query(query, call_gemini),
+                               persist=lambda toc: not isinstance(toc, FallbackToc))
+        # Sections are stored by position in the TOC, so those written for a fallback TOC
+        # must not be restored once a resumed run has generated the real one.
+        checkpoint_sections = job_id and not isinstance(sections, FallbackToc)
+    
+        # The raw LLM markdown is stored per stage; LaTeX and previews are both rendered from it.
+        logger.info("Step 2: Generating Main Content...")
+        semantic_cache = get_semantic_cache()
+        with span("section_md", "stage"):
+            section_markdown = collect_section_markdown(
+                sections, query, call_gemini,
+                fragment_cache=StageCache(self.job_store, job_id, "section_md", self._worker_id) if checkpoint_sections else None,
+                semantic_cache=semantic_cache
+            )
+        if semantic_cache is not None:
+            semantic_cache.log_stats()
 
-        logger.info("Step 6: Combining .tex files...")
-        self._combine_latex_files(final_tex_path, report_title, has_appendices, primary_color)
-        
+        logger.info("Step 3: Generating Bibliography...")
+        bibliography_raw = self._stage(job_id, "bibliography_md", lambda: self._request_or_error(request_bibliography, query, call_gemini))
+
+        logger.info("Step 4: Generating Appendices...")
+        needs_appendices = self._stage(job_id, "appendix_decision", lambda: decide_appendices(query, call_gemini),
+                                       persist=lambda decision: decision is not None)
+        if needs_appendices is None:
+            # The decision call failed: no appendices this time, and nothing stored, so a resume asks again.
+            appendices_markdown = None
+        else:
+            appendices_markdown = self._stage(job_id, "appendices_md", lambda: request_appendices(query, call_gemini, decision=needs_appendices))
+
+        if output_format != OUTPUT_FORMAT_PDF:
+            logger.info("Step 5: Rendering %s preview (no LaTeX build)...", output_format)
+            with span("preview", "stage", output_format=output_format):
+                return write_preview(
+                    output_base + PREVIEW_EXTENSIONS[output_format], output_format,
+                    report_title=report_title, primary_color=primary_color, logo_path=local_logo_path,
+                    user_figure_path=os.path.join(self.temp_dir, user_figure_basename) if user_figure_basename else None,
+                    authors=authors, date=date, mentors=mentors, university=university, sections=sections,
+                    section_markdown=section_markdown, bibliography_raw=bibliography_raw,
+                    appendices_markdown=appendices_markdown, user_figure_caption=user_figure_caption
+                )
+
+        logger.info("Step 5: Writing LaTeX fragments...")
+        with span("latex_fragments", "stage"):
+            generate_cover_page(
+                report_title=report_title, authors=authors, date=date, mentors=mentors or [],
+                university=university, logo_path=local_logo_path,
+                primary_color=primary_color,
+                output_path=self.cover_path, main_tex_output_dir=self.output_dir
+            )
+            generate_main_content(
+                sections=sections, query=query, output_file=self.main_content_path,
+                from_generator_func=call_gemini, use_rag=self.use_rag,
+                user_figure_basename=user_figure_basename, user_figure_caption=user_figure_caption,
+                section_markdown=section_markdown
+            )
+            write_bibliography(bibliography_raw, self.bibliography_path)
+            has_appendices = write_appendices(appendices_markdown, self.appendices_path) is not None
+
+        logger.info("Step 6: Validating and combining .tex files...")
+        self._validate_fragments()
+        self._file_stage(job_id, "combined_tex", final_tex_path,
+                         lambda: self._combine_latex_files(final_tex_path, report_title, has_appendices, primary_color))
+    
         logger.info("Step 7: Compiling PDF...")
         if self._compile_pdf(final_tex_path):
+            self._check_lease()
+            with span("optimize_pdf", "stage"):
+                optimize_pdf(final_pdf_path)
             return final_pdf_path
         return final_tex_path
 
-    def _combine_latex_files(self, final_path: str, title: str, has_appendices: bool, color: str):
-        temp_dir_basename = os.path.basename(self.temp_dir).replace('\\', '/')
+    def _validate_fragments(self):
+        # Cheap pure-Python pass that repairs what would otherwise fail a pdflatex run.
+        start = time.perf_counter()
+        with span("validate_latex", "stage"):
+            repaired = [
+                repair_file(self.cover_path, "cover", extra_commands=COVER_LATEX_COMMANDS,
+                            extra_environments=COVER_LATEX_ENVIRONMENTS, allow_comments=True),
+                repair_file(self.main_content_path, "main content"),
+                repair_file(self.bibliography_path, "bibliography"),
+                repair_file(self.appendices_path, "appendices"),
+            ]
+        logger.info("Validated LaTeX fragments in %.1f ms (%s repaired)", (time.perf_counter() - start) * 1000, sum(repaired))
+
+    def _combine_latex_files(self, final_path: str, title: str, has_appendices: bool, color: str) -> str:
+        temp_dir_basename = os.path.relpath(self.temp_dir, os.path.dirname(final_path)).replace('\\', '/')
         metadata_title = escape_latex_special_chars(title)
         
         content = f"""\\documentclass[11pt,a4paper]{{article}}
@@ -108,32 +362,110 @@ class ReportGenerator:
 {'\\clearpage \\input{{{_t}/{_a}}}'.format(_t=temp_dir_basename, _a=os.path.basename(self.appendices_path)) if has_appendices else ''}
 \\end{{document}}"""
         with open(final_path, "w", encoding="utf-8") as f: f.write(content)
-        logger.info(f"Combined LaTeX into '{final_path}'")
+        logger.info("Combined LaTeX into '%s'", final_path)
+        return final_path
+
+    def _remove_intermediates(self, tex_path: str):
+        # Only called after a successful build; failed builds keep their .log for debugging.
+        base_path = os.path.splitext(tex_path)[0]
+        for ext in LATEX_INTERMEDIATE_EXTENSIONS:
+            try:
+                os.remove(base_path + ext)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove LaTeX intermediate %s: %s", base_path + ext, e)
 
     def _compile_pdf(self, tex_path: str) -> bool:
         compile_dir, tex_filename = os.path.split(tex_path)
-        original_cwd = os.getcwd()
         try:
-            os.chdir(compile_dir)
             cmd = ["pdflatex", "-interaction=nonstopmode", "-halt-on-error", tex_filename]
             for i in range(3):
-                logger.info(f"Running pdflatex pass {i + 1}/3...")
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=180, encoding='utf-8', errors='ignore')
+                logger.info("Running pdflatex pass %s/3...", i + 1)
+                queued = time.perf_counter()
+                with _pdflatex_slots:
+                    # Another worker owning the job now writes the same output files.
+                    self._check_lease()
+                    # Time spent waiting for a pdflatex slot is recorded apart from the run itself.
+                    with span(f"pdflatex pass {i + 1}/3", "subprocess", queued_ms=round((time.perf_counter() - queued) * 1000, 1)) as span_args:
+                        result = subprocess.run(cmd, cwd=compile_dir, capture_output=True, text=True, timeout=180, encoding='utf-8', errors='ignore')
+                        span_args["returncode"] = result.returncode
                 if result.returncode != 0:
                     log_path = tex_path.replace('.tex', '.log')
                     if os.path.exists(log_path):
                         with open(log_path, 'r', encoding='utf-8', errors='ignore') as log_file:
-                            logger.error(f"pdflatex failed on pass {i+1}. Log tail:\\n{log_file.read()[-2000:]}")
+                            logger.error("pdflatex failed on pass %s. Log tail:\\n%s", i+1, log_file.read()[-2000:])
                     break
             pdf_path = tex_path.replace('.tex', '.pdf')
             if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 1024:
                 logger.info("PDF compilation successful.")
+                self._remove_intermediates(tex_path)
                 return True
             else:
                 logger.error("PDF compilation failed or produced an empty file.")
                 return False
+        except LeaseLostError:
+            raise
         except Exception as e:
-            logger.error(f"An exception occurred during PDF compilation: {e}")
+            logger.error("An exception occurred during PDF compilation: %s", e)
             return False
-        finally:
-            os.chdir(original_cwd)
\ No newline at end of file
+
+def resume_job(job_store: JobStore, job_id: str, output_format: Optional[str] = None, profile: Optional[str] = None) -> str:
+    """
+    Rebuilds a stored job with its original parameters, skipping every stage already
+    completed. `output_format` overrides the stored one, e.g. to build the PDF of a previewed job.
+    `profile` traces this run only; it is not stored with the job.
+    """
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise KeyError(f"Unknown job: {job_id}")
+    params = dict(job["params"])
+    if output_format:
+        params["output_format"] = output_format
+    report_generator = ReportGenerator(
+        output_dir=params.pop("output_dir"), use_rag=params.pop("use_rag"), job_store=job_store
+    )
+    return report_generator.generate_report(**params, job_id=job_id, profile=profile)
+
+def resume_abandoned_jobs(job_store: JobStore, profile: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+    """Resumes every job whose worker died mid-build. Returns (job_id, result path or None)."""
+    results = []
+    for job_id in job_store.abandoned_jobs():
+        logger.info("Resuming abandoned job %s", job_id)
+        try:
+            results.append((job_id, resume_job(job_store, job_id, profile=profile)))
+        except Exception as e:
+            logger.error("Could not resume job %s: %s", job_id, e)
+            results.append((job_id, None))
+    return results
+
+def run_job_recovery(job_store: JobStore, stop_event: threading.Event, interval_seconds: float):
+    """Background loop that picks up abandoned jobs until `stop_event` is set."""
+    while not stop_event.is_set():
+        try:
+            resume_abandoned_jobs(job_store)
+        except Exception as e:
+            logger.error("Job recovery pass failed: %s", e)
+        stop_event.wait(interval_seconds)
+
+if __name__ == "__main__":
+    import argparse
+    from log_config import setup_logging
+    from profiling import PROFILE_MODES, PROFILE_TRACE
+
+    parser = argparse.ArgumentParser(description="Resume report jobs left unfinished in the job store.")
+    parser.add_argument("job_ids", nargs="*", help="Jobs to resume (default: every abandoned job).")
+    parser.add_argument("--jobs-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build", "jobs"),
+                        help="Directory holding jobs.sqlite3 and the job workspaces.")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_TRACE, choices=PROFILE_MODES, default=None,
+                        help="Write a Chrome-trace timeline (and with 'cprofile', cProfile data) next to each report.")
+    args = parser.parse_args()
+    setup_logging(log_file=None)
+
+    store = JobStore(args.jobs_dir)
+    if args.job_ids:
+        for job_id in args.job_ids:
+            print(f"{job_id}: {resume_job(store, job_id, profile=args.profile)}")
+    else:
+        for job_id, path in resume_abandoned_jobs(store, profile=args.profile):
+            print(f"{job_id}: {path or 'failed'}")
@@ -0,0 +1,86 @@
+# backend/src/pdf_postprocess.py
+"""
+Post-compile optimization of the PDFs pdflatex produces.
+
+PyMuPDF rewrites the file with garbage collection and object deduplication
+(garbage=4), deflated streams, cleaned content streams and, by default,
+linearization ("fast web view"), so viewers can show page 1 before the whole
+file has arrived. MuPDF cannot combine linearization with object streams; when
+linearization is disabled or unavailable, object streams are used instead for
+the smallest file. The stage is skipped if PyMuPDF is not installed or
+PDF_POSTPROCESS=0, and it never fails a build: on any error the original
+file is kept.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Dict, Optional
+
+# Imported as `pymupdf` rather than `fitz`: requirements.txt also pins the unrelated `fitz` package.
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+logger = logging.getLogger()
+
+PDF_POSTPROCESS_ENABLED = os.getenv("PDF_POSTPROCESS", "1").lower() in ("1", "true", "yes")
+PDF_LINEARIZE = os.getenv("PDF_LINEARIZE", "1").lower() in ("1", "true", "yes")
+
+_SAVE_OPTIONS = {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "clean": True}
+
+def optimize_pdf(pdf_path: str, linearize: bool = PDF_LINEARIZE) -> Optional[Dict[str, Any]]:
+    """
+    Rewrites `pdf_path` in place and returns a report (bytes before/after, seconds,
+    whether it was linearized), or None if the stage was skipped or failed.
+    """
+    if not PDF_POSTPROCESS_ENABLED:
+        return None
+    if pymupdf is None:
+        logger.debug("PyMuPDF is not installed; skipping PDF post-processing.")
+        return None
+
+    start = time.perf_counter()
+    tmp_path = pdf_path + ".opt"
+    variants = [{"linear": True}, {"use_objstms": 1}] if linearize else [{"use_objstms": 1}]
+    try:
+        original_bytes = os.path.getsize(pdf_path)
+        with pymupdf.open(pdf_path) as doc:
+            for variant in variants:
+                try:
+                    doc.save(tmp_path, **_SAVE_OPTIONS, **variant)
+                    linearized = bool(variant.get("linear"))
+                    break
+                except Exception as e:
+                    # Newer MuPDF builds dropped linearization; fall through to object streams.
+                    logger.warning("PDF save with %s failed for %s: %s", variant, pdf_path, e)
+            else:
+                return None
+
+        optimized_bytes = os.path.getsize(tmp_path)
+        # A linearized file is worth keeping even if its hint tables made it slightly larger.
+        if optimized_bytes >= original_bytes and not linearized:
+            os.remove(tmp_path)
+            optimized_bytes = original_bytes
+        else:
+            os.replace(tmp_path, pdf_path)
+    except Exception as e:
+        logger.error("PDF post-processing failed for %s, keeping the original: %s", pdf_path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    report = {
+        "original_bytes": original_bytes,
+        "optimized_bytes": optimized_bytes,
+        "seconds": time.perf_counter() - start,
+        "linearized": linearized,
+    }
+    logger.info(
+        "Optimized %s: %.1f KB -> %.1f KB (%+.1f%%) in %.0f ms%s",
+        os.path.basename(pdf_path), original_bytes / 1024, optimized_bytes / 1024,
+        (optimized_bytes - original_bytes) * 100 / max(original_bytes, 1), report["seconds"] * 1000,
+        ", linearized" if report["linearized"] else ""
+    )
+    return report
@@ -0,0 +1,153 @@
+# backend/src/preview.py
+"""
+HTML/Markdown rendering of a report straight from the LLM markdown.
+
+The preview uses the same TOC, section, bibliography and appendix content as
+the PDF, but skips LaTeX entirely: the pieces are assembled into one Markdown
+document, which markdown-it-py renders into a single self-contained HTML page
+(styles inline, images embedded as data URIs). Rendering takes milliseconds,
+so users can read a report before asking for the PDF build.
+"""
+
+import os
+import re
+import time
+import base64
+import html
+import logging
+from typing import Any, Dict, List, Optional
+
+from markdown_it import MarkdownIt
+
+from main_content import iter_section_titles
+from supplementary import split_bibliography
+
+logger = logging.getLogger()
+
+OUTPUT_FORMAT_PDF = "pdf"
+OUTPUT_FORMAT_HTML = "html"
+OUTPUT_FORMAT_MARKDOWN = "markdown"
+OUTPUT_FORMATS = (OUTPUT_FORMAT_PDF, OUTPUT_FORMAT_HTML, OUTPUT_FORMAT_MARKDOWN)
+PREVIEW_EXTENSIONS = {OUTPUT_FORMAT_HTML: ".html", OUTPUT_FORMAT_MARKDOWN: ".md"}
+
+# Raw HTML in LLM output is escaped, never passed through.
+_markdown = MarkdownIt("commonmark", {"html": False}).enable("table")
+
+_HEADING_RE = re.compile(r'^(#{1,6})(?=\s)')
+_RGB_RE = re.compile(r'^\s*\d{1,3}\s*,\s*\d{1,3}\s*,\s*\d{1,3}\s*$')
+_IMAGE_MIME_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".gif": "image/gif", ".webp": "image/webp"}
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ max-width: 48rem; margin: 2rem auto; padding: 0 1rem; font: 17px/1.6 Georgia, "Times New Roman", serif; color: #222; }}
+h1, h2, h3, h4, h5, h6 {{ color: rgb({color}); line-height: 1.25; }}
+h1 {{ text-align: center; }}
+pre {{ background: #f5f5f5; padding: 0.75rem; overflow-x: auto; }}
+code {{ font-family: Consolas, Menlo, monospace; font-size: 0.9em; }}
+blockquote {{ border-left: 3px solid rgb({color}); margin-left: 0; padding-left: 1rem; color: #555; }}
+table {{ border-collapse: collapse; }} th, td {{ border: 1px solid #ccc; padding: 0.25rem 0.5rem; }}
+img {{ display: block; max-width: 80%; margin: 1rem auto; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+def _demote_headings(markdown: str, levels: int) -> str:
+    """Pushes the LLM's own headings below the report's section headings (code fences untouched)."""
+    lines, in_fence = [], False
+    for line in markdown.split("\n"):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        elif not in_fence:
+            line = _HEADING_RE.sub(lambda m: "#" * min(6, len(m.group(1)) + levels), line)
+        lines.append(line)
+    return "\n".join(lines)
+
+def _image_data_uri(path: Optional[str]) -> Optional[str]:
+    mime_type = _IMAGE_MIME_TYPES.get(os.path.splitext(path or "")[1].lower())
+    if not mime_type or not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+def build_markdown_document(
+    report_title: str, authors: List[str], date: Optional[str], mentors: Optional[List[str]],
+    university: Optional[str], sections: List[Dict[str, Any]], section_markdown: Dict[str, Optional[str]],
+    bibliography_raw: Optional[str], appendices_markdown: Optional[str],
+    logo_uri: Optional[str] = None, user_figure_uri: Optional[str] = None, user_figure_caption: Optional[str] = None
+) -> str:
+    """Assembles the report as one Markdown document, in the same order as the PDF."""
+    parts = []
+    if logo_uri:
+        parts.append(f"![Logo]({logo_uri})")
+    parts.append(f"# {report_title}")
+    front_matter = [f"**Authors:** {', '.join(authors)}" if authors else "",
+                    f"**Mentors:** {', '.join(mentors)}" if mentors else "",
+                    " · ".join(filter(None, [university, date]))]
+    parts.append("  \n".join(line for line in front_matter if line))
+
+    toc_lines, body = [], []
+    sec_number = sub_number = 0
+    for key, title, sub_title in iter_section_titles(sections):
+        if sub_title is None:
+            sec_number, sub_number = sec_number + 1, 0
+            toc_lines.append(f"{sec_number}. {title}")
+            body.append(f"## {sec_number}. {title}")
+            levels = 2
+        else:
+            sub_number += 1
+            toc_lines.append(f"    {sub_number}. {sub_title}")
+            body.append(f"### {sec_number}.{sub_number} {sub_title}")
+            levels = 3
+        content = section_markdown.get(key)
+        body.append(_demote_headings(content, levels) if content is not None else "*Error: Could not generate content for this section.*")
+
+    parts.append("## Contents\n\n" + "\n".join(toc_lines))
+    if user_figure_uri:
+        caption = user_figure_caption or "User-provided figure."
+        parts.append(f"![{caption}]({user_figure_uri})\n\n*Figure: {caption}*")
+    parts.extend(body)
+
+    references = [" ".join(content.split()) for _, content in split_bibliography(bibliography_raw)]
+    parts.append("## References\n\n" + ("\n".join(f"{i}. {ref}" for i, ref in enumerate(references, 1))
+                                        if references else "*Error: Could not generate bibliography.*"))
+    if appendices_markdown:
+        parts.append("## Appendices\n\n" + _demote_headings(appendices_markdown, 1))
+    return "\n\n".join(parts) + "\n"
+
+def render_html(markdown_document: str, title: str, primary_color: Optional[str]) -> str:
+    color = primary_color if primary_color and _RGB_RE.match(primary_color) else "0, 51, 102"
+    return _HTML_TEMPLATE.format(title=html.escape(title), color=color, body=_markdown.render(markdown_document))
+
+def write_preview(
+    output_path: str, output_format: str, report_title: str, primary_color: Optional[str],
+    logo_path: Optional[str] = None, user_figure_path: Optional[str] = None, **document: Any
+) -> str:
+    """
+    Writes the HTML or Markdown preview to `output_path` and returns it. `document`
+    holds the build_markdown_document arguments other than the title and images.
+    """
+    start = time.perf_counter()
+    if output_format == OUTPUT_FORMAT_HTML:
+        # Images are embedded so the page can be opened or sent on its own.
+        markdown_document = build_markdown_document(
+            report_title, logo_uri=_image_data_uri(logo_path), user_figure_uri=_image_data_uri(user_figure_path), **document
+        )
+        content = render_html(markdown_document, report_title, primary_color)
+    elif output_format == OUTPUT_FORMAT_MARKDOWN:
+        content = build_markdown_document(report_title, **document)
+    else:
+        raise ValueError(f"Unsupported preview format: {output_format}")
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    logger.info("Rendered %s preview to %s in %.1f ms", output_format, output_path, (time.perf_counter() - start) * 1000)
+    return output_path
@@ -0,0 +1,175 @@
+# backend/src/profiling.py
+"""
+Opt-in per-report performance traces.
+
+While a report is built with profiling on, every orchestrator stage, Gemini call
+(with each retry attempt and each request sent), backoff or pacing sleep, and
+pdflatex run is recorded as a span. The timeline is written next to the report
+as Chrome trace JSON (`<report>.trace.json`), which opens in https://ui.perfetto.dev
+or chrome://tracing. Mode "cprofile" additionally writes the build's cProfile
+data (`<report>.prof`, for pstats or snakeviz).
+
+The active profiler lives in a context variable, so concurrent builds never mix
+their spans, and worker threads started with contextvars.copy_context() (hedged
+Gemini requests) report into the build that started them. With profiling off a
+span costs one context variable lookup.
+"""
+
+import os
+import json
+import time
+import cProfile
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger()
+
+PROFILE_TRACE = "trace"
+PROFILE_CPROFILE = "cprofile"
+PROFILE_MODES = (PROFILE_TRACE, PROFILE_CPROFILE)
+TRACE_SUFFIX = ".trace.json"
+CPROFILE_SUFFIX = ".prof"
+
+_OFF_VALUES = {"", "0", "false", "no", "off"}
+_ON_VALUES = {"1", "true", "yes", "on"}
+
+_profiler_var: contextvars.ContextVar = contextvars.ContextVar("profiler", default=None)
+
+def parse_profile_mode(value: Any) -> Optional[str]:
+    """Maps a form field, header or CLI value to a profile mode (None when off). Raises ValueError if unknown."""
+    if value is None or value is False:
+        return None
+    if value is True:
+        return PROFILE_TRACE
+    normalized = str(value).strip().lower()
+    if normalized in _OFF_VALUES:
+        return None
+    if normalized in _ON_VALUES:
+        return PROFILE_TRACE
+    if normalized in PROFILE_MODES:
+        return normalized
+    raise ValueError(f"Unknown profile mode '{value}' (expected one of: {', '.join(PROFILE_MODES)})")
+
+class Profiler:
+    def __init__(self, name: str, mode: str = PROFILE_TRACE):
+        self.name = name
+        self.mode = mode
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._thread_names: Dict[int, str] = {}
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def add_span(self, name: str, category: str, start: float, end: float, args: Optional[Dict[str, Any]] = None):
+        """Records a complete event; `start` and `end` are time.perf_counter() values."""
+        thread = threading.current_thread()
+        event = {
+            "name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+            "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def start_cprofile(self):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows a single active cProfile per process.
+            logger.warning("cProfile not available for report %s: %s", self.name, e)
+            return
+        self._cprofile = profile
+
+    def stop_cprofile(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def trace(self) -> Dict[str, Any]:
+        """The recorded spans in Chrome trace event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"report {self.name}"}}]
+            events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                          for tid, thread_name in self._thread_names.items())
+            events.extend(sorted(self._events, key=lambda e: e["ts"]))
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"report": self.name, "mode": self.mode,
+                          "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started_at))},
+        }
+
+    def write(self, output_base: str) -> List[str]:
+        """Writes `<output_base>.trace.json` (and `.prof` with cProfile data); returns the written paths."""
+        paths = []
+        try:
+            trace = self.trace()
+            with open(output_base + TRACE_SUFFIX, "w", encoding="utf-8") as f:
+                json.dump(trace, f)
+            paths.append(output_base + TRACE_SUFFIX)
+            if self._cprofile is not None:
+                self._cprofile.dump_stats(output_base + CPROFILE_SUFFIX)
+                paths.append(output_base + CPROFILE_SUFFIX)
+        except OSError as e:
+            logger.error("Could not write the performance trace for report %s: %s", self.name, e)
+            return paths
+        logger.info("Performance trace of report %s (%s spans) written to %s",
+                    self.name, len(trace["traceEvents"]), ", ".join(paths))
+        return paths
+
+@contextmanager
+def profiling(name: str, mode: Optional[str], output_base: Optional[str] = None) -> Iterator[Optional[Profiler]]:
+    """
+    Profiles everything run in this context (and contexts copied from it) when `mode`
+    is set. With `output_base`, the trace is written on exit, even if the build failed.
+    """
+    if mode is None:
+        yield None
+        return
+    profiler = Profiler(name, mode)
+    token = _profiler_var.set(profiler)
+    if mode == PROFILE_CPROFILE:
+        profiler.start_cprofile()
+    try:
+        yield profiler
+    finally:
+        profiler.stop_cprofile()
+        _profiler_var.reset(token)
+        if output_base:
+            profiler.write(output_base)
+
+@contextmanager
+def span(name: str, category: str = "stage", **args: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Records the enclosed block as a span of the active profiler, if any. Yields the
+    span's args dict so the block can attach results (e.g. whether a stage was restored).
+    """
+    profiler = _profiler_var.get()
+    if profiler is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        profiler.add_span(name, category, start, time.perf_counter(), args)
+
+def traced_sleep(seconds: float, reason: str):
+    """time.sleep that shows up in the trace, so waiting is never mistaken for work."""
+    with span(f"sleep: {reason}", "sleep", seconds=seconds):
+        time.sleep(seconds)
+
+def profile_artifacts(report_path: str) -> List[str]:
+    """The trace/cProfile files written next to `report_path`, if any."""
+    base = os.path.splitext(report_path)[0]
+    return [path for path in (base + TRACE_SUFFIX, base + CPROFILE_SUFFIX) if os.path.exists(path)]
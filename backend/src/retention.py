@@ -0,0 +1,143 @@
+# backend/src/retention.py
+"""
+Background janitor for the build directory.
+
+The build directory is treated as a set of artifacts: each top-level report
+file, each batch directory, each job workspace and each stored asset. A sweep
+removes artifacts older than the age quota and, while the directory is over its
+size quota, evicts the least recently used ones. Artifacts younger than a grace
+period (builds still in progress) and anything a `protect` callback claims
+(assets still referenced by a request, workspaces of resumable jobs) are never touched.
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger()
+
+BUILD_MAX_BYTES = int(os.getenv("BUILD_MAX_BYTES", str(2 * 1024 ** 3)))
+BUILD_MAX_AGE_HOURS = float(os.getenv("BUILD_MAX_AGE_HOURS", "72"))
+BUILD_MIN_AGE_SECONDS = float(os.getenv("BUILD_MIN_AGE_SECONDS", "600"))
+BUILD_JANITOR_INTERVAL_SECONDS = float(os.getenv("BUILD_JANITOR_INTERVAL_SECONDS", "300"))
+
+# Subdirectories whose children are each one artifact; everything else at the top level is one artifact itself.
+ARTIFACT_CONTAINERS = ("batches", "api_orchestrator_temp", "jobs", "assets", os.path.join("assets", "normalized"))
+
+def _tree_stats(path: str) -> Tuple[int, float]:
+    """Returns (total size in bytes, newest mtime) for a file or directory tree."""
+    if not os.path.isdir(path) or os.path.islink(path):
+        st = os.lstat(path)
+        return st.st_size, st.st_mtime
+    total, newest = 0, os.lstat(path).st_mtime
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+class BuildJanitor:
+    def __init__(
+        self, root_dir: str, max_bytes: int = BUILD_MAX_BYTES, max_age_hours: float = BUILD_MAX_AGE_HOURS,
+        min_age_seconds: float = BUILD_MIN_AGE_SECONDS, interval_seconds: float = BUILD_JANITOR_INTERVAL_SECONDS,
+        protect: Optional[Callable[[str], bool]] = None, on_sweep: Optional[Callable[[], None]] = None
+    ):
+        self.root_dir = os.path.abspath(root_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_hours * 3600
+        self.min_age_seconds = min_age_seconds
+        self.interval_seconds = interval_seconds
+        self.protect = protect
+        self.on_sweep = on_sweep
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, path: str):
+        """Records an access (e.g. a download) so LRU eviction sees it even on noatime mounts."""
+        with self._lock:
+            self._last_access[os.path.abspath(path)] = time.time()
+
+    def _artifacts(self) -> List[str]:
+        containers = {os.path.join(self.root_dir, c) for c in ARTIFACT_CONTAINERS}
+        artifacts = []
+        for parent in [self.root_dir, *sorted(containers)]:
+            if not os.path.isdir(parent):
+                continue
+            for entry in os.scandir(parent):
+                # Staging directories and databases (e.g. jobs.sqlite3) are infrastructure, not artifacts.
+                if entry.path in containers or entry.name == "tmp" or ".sqlite3" in entry.name:
+                    continue
+                artifacts.append(entry.path)
+        return artifacts
+
+    def sweep(self) -> int:
+        """Runs one eviction pass and returns the number of bytes freed."""
+        now = time.time()
+        candidates = []
+        total_bytes = 0
+        for path in self._artifacts():
+            try:
+                size, mtime = _tree_stats(path)
+            except OSError:
+                continue
+            total_bytes += size
+            with self._lock:
+                last_used = max(mtime, self._last_access.get(path, 0.0))
+            if now - last_used < self.min_age_seconds or (self.protect and self.protect(path)):
+                continue
+            candidates.append((last_used, size, path))
+
+        freed = 0
+        # Oldest first: expired artifacts go unconditionally, then LRU until under quota.
+        for last_used, size, path in sorted(candidates):
+            expired = now - last_used > self.max_age_seconds
+            if not expired and total_bytes - freed <= self.max_bytes:
+                break
+            if self._remove(path):
+                freed += size
+        if freed:
+            logger.info("Build janitor freed %.1f MB (build dir was %.1f MB)", freed / 1024 ** 2, total_bytes / 1024 ** 2)
+        return freed
+
+    def _remove(self, path: str) -> bool:
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Build janitor could not remove %s: %s", path, e)
+            return False
+        with self._lock:
+            self._last_access.pop(path, None)
+        logger.debug("Build janitor evicted %s", path)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sweep()
+                if self.on_sweep:
+                    self.on_sweep()
+            except Exception as e:
+                logger.error("Build janitor sweep failed: %s", e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="build-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
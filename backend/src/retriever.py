@@ -2,6 +2,7 @@
 
 import os
 import logging
+import threading
 import numpy as np
 from typing import List, Optional
 from sentence_transformers import SentenceTransformer
@@ -9,6 +10,19 @@ from sentence_transformers import SentenceTransformer
 # Configure logging
 logger = logging.getLogger()
 
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+_embedding_model: Optional[SentenceTransformer] = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model() -> SentenceTransformer:
+    """Loads the MiniLM sentence embedding model once per process and returns it."""
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            logger.info("Loading sentence embedding model %s", EMBEDDING_MODEL_NAME)
+            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        return _embedding_model
+
 # Define a fallback retriever function for when dependencies are not available
 def retrieve_chunks(query: str, k: int = 5) -> List[str]:
     """
@@ -21,12 +35,12 @@ def retrieve_chunks(query: str, k: int = 5) -> List[str]:
     3. No database exists at the specified path
     """
     try:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        model = get_embedding_model()
         query_embedding = model.encode(query)
         
         embeddings_dir = os.path.join(os.path.dirname(__file__), 'embeddings')
         if not os.path.exists(embeddings_dir):
-            logger.warning(f"Embeddings directory not found: {embeddings_dir}")
+            logger.warning("Embeddings directory not found: %s", embeddings_dir)
             return []
         
         chunks = []
@@ -50,5 +64,5 @@ def retrieve_chunks(query: str, k: int = 5) -> List[str]:
         
         return retrieved_texts
     except Exception as e:
-        logger.error(f"Error in retrieve_chunks: {e}")
+        logger.error("Error in retrieve_chunks: %s", e)
         return []
\ No newline at end of file
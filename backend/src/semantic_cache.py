@@ -0,0 +1,112 @@
+# backend/src/semantic_cache.py
+"""
+Opt-in semantic cache of generated section content.
+
+Briefs that differ only in wording ("AI in autonomous vehicles" vs "autonomous
+vehicle AI") ask for the same sections. Each generated section is stored with
+the MiniLM embeddings of its report query and its section title; a new section
+whose query AND title are both at least SEMANTIC_CACHE_THRESHOLD similar
+(cosine) to a stored pair is served from the cache instead of calling Gemini.
+
+The index is an in-memory numpy matrix bounded to SEMANTIC_CACHE_MAX_ENTRIES
+rows; when full, the least recently used entry is overwritten. Enable it with
+SEMANTIC_CACHE_ENABLED=1.
+"""
+
+import os
+import time
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_MAX_ENTRIES = max(1, int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")))
+
+@lru_cache(maxsize=1024)
+def _embed(text: str) -> np.ndarray:
+    # Imported lazily: loading sentence-transformers (and torch) is only worth it when the cache is on.
+    from retriever import get_embedding_model
+    vector = np.asarray(get_embedding_model().encode(text), dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, embed=_embed):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._query_vectors: Optional[np.ndarray] = None  # (max_entries, dim), unit rows
+        self._title_vectors: Optional[np.ndarray] = None
+        self._last_used = np.full(max_entries, -np.inf)   # -inf marks an empty slot
+        self._entries: list = [None] * max_entries
+        self._stats = {"lookups": 0, "hits": 0, "inserts": 0, "evictions": 0}
+
+    def _allocate(self, dim: int):
+        self._query_vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._title_vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+
+    def lookup(self, query: str, section_title: str) -> Optional[str]:
+        """Returns cached content for a near-duplicate (query, section title), or None."""
+        query_vector, title_vector = self._embed(query), self._embed(section_title)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if self._query_vectors is None:
+                return None
+            # Both the brief and the section must match; empty slots can never qualify.
+            scores = np.minimum(self._query_vectors @ query_vector, self._title_vectors @ title_vector)
+            scores[np.isneginf(self._last_used)] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            self._stats["hits"] += 1
+            self._last_used[best] = time.monotonic()
+            entry = self._entries[best]
+        logger.info("Semantic cache hit (similarity %.3f) for section '%s': reusing content from '%s' / '%s'",
+                    scores[best], section_title, entry["query"], entry["section_title"])
+        return entry["content"]
+
+    def add(self, query: str, section_title: str, content: str):
+        query_vector, title_vector = self._embed(query), self._embed(section_title)
+        with self._lock:
+            if self._query_vectors is None:
+                self._allocate(query_vector.shape[0])
+            slot = int(np.argmin(self._last_used))  # an empty slot if any, else the least recently used
+            if not np.isneginf(self._last_used[slot]):
+                self._stats["evictions"] += 1
+            self._query_vectors[slot] = query_vector
+            self._title_vectors[slot] = title_vector
+            self._entries[slot] = {"query": query, "section_title": section_title, "content": content}
+            self._last_used[slot] = time.monotonic()
+            self._stats["inserts"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = int(np.count_nonzero(~np.isneginf(self._last_used)))
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info("Semantic cache: %s hits / %s lookups (hit rate %.1f%%), %s entries, %s evictions",
+                    stats["hits"], stats["lookups"], stats["hit_rate"] * 100, stats["entries"], stats["evictions"])
+
+_shared_cache: Optional[SemanticCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """The process-wide cache, or None unless SEMANTIC_CACHE_ENABLED is set."""
+    global _shared_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SemanticCache()
+        return _shared_cache
@@ -2,15 +2,16 @@
 
 import logging
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from latex_utils import process_llm_output_for_latex, escape_latex_special_chars
+from latex_validator import repair_fragment
+from model_router import TASK_BIBLIOGRAPHY, TASK_APPENDIX_DECISION, TASK_APPENDIX, is_failed_generation
 
 logger = logging.getLogger(__name__)
 
-def generate_bibliography(query: str, sections: List[Dict], output_file: str, from_generator_func):
-    """Generates the bibliography section with a robust prompt and safer processing."""
-    
+def request_bibliography(query: str, from_generator_func) -> str:
+    """Asks the LLM for 5-7 bibliography entries; returns its raw `\\bibitem` output."""
     prompt = f"""You are an academic assistant. Generate a list of 5-7 complete bibliography entries for a report on "{query}".
 
 CRITICAL FORMATTING RULES:
@@ -24,34 +25,37 @@ EXAMPLE:
 \\bibitem{{Vaswani2017}}
 Vaswani, A., et al. (2017). *Attention is all you need*. Advances in neural information processing systems, 30.
 """
-    try:
-        raw_output = from_generator_func(prompt)
+    return from_generator_func(prompt, task=TASK_BIBLIOGRAPHY)
+
+def split_bibliography(raw_output: Optional[str]) -> List[Tuple[str, str]]:
+    """Splits raw LLM bibliography output into (key, markdown content) pairs."""
+    # Surgically find and isolate only the bibitem content
+    start_pos = raw_output.find('\\bibitem') if raw_output else -1
+    if start_pos == -1:
+        return []
+    # Discard any conversational text before the first bibitem.
+    # The split results in ['', key1, content1, key2, content2, ...].
+    items = re.split(r'\\bibitem\{(.*?)\}', raw_output[start_pos:])
+    return [(items[i], items[i + 1]) for i in range(1, len(items), 2)]
 
-        # Surgically find and isolate only the bibitem content
-        start_pos = raw_output.find('\\bibitem')
-        if start_pos == -1:
+def write_bibliography(raw_output: Optional[str], output_file: str) -> str:
+    """Renders raw LLM bibliography output as a LaTeX thebibliography fragment."""
+    try:
+        entries = split_bibliography(raw_output)
+        if not entries:
             logger.error("No \\bibitem entries found in LLM output for bibliography.")
             bib_content = "\\item Error: Could not generate bibliography."
         else:
-            # Discard any conversational text before the first bibitem
-            bib_section = raw_output[start_pos:]
-            
-            # The split results in ['', command1, content1, command2, content2, ...].
-            items = re.split(r'(\\bibitem\{.*?\})', bib_section)
-            
             processed_bib_items = []
-            # Iterate through command-content pairs.
-            for i in range(1, len(items), 2):
-                command = items[i]
-                content = items[i+1]
-                
+            for key, content in entries:
                 # Escape special characters in the content, then convert markdown.
                 escaped_content = escape_latex_special_chars(content)
                 processed_content = re.sub(r'\*(.*?)\*', r'\\textit{\1}', escaped_content)
                 
-                processed_bib_items.append(command + processed_content)
+                processed_bib_items.append(f"\\bibitem{{{key}}}" + processed_content)
             
-            bib_content = ''.join(processed_bib_items)
+            # Also sanitizes \bibitem keys the LLM made up with spaces or specials.
+            bib_content = repair_fragment(''.join(processed_bib_items), "bibliography")
 
         final_content = f"""\\addcontentsline{{toc}}{{section}}{{References}}
 \\begin{{thebibliography}}{{99}}
@@ -60,25 +64,51 @@ Vaswani, A., et al. (2017). *Attention is all you need*. Advances in neural info
         
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(final_content)
-        logger.info(f"Bibliography written to {output_file}")
+        logger.info("Bibliography written to %s", output_file)
         return output_file
     except Exception as e:
-        logger.error(f"Error in generate_bibliography: {e}")
+        logger.error("Error in write_bibliography: %s", e)
         with open(output_file, "w", encoding="utf-8") as f:
             f.write("\\addcontentsline{toc}{section}{References}\\begin{thebibliography}{99}\\item Error generating bibliography.\\end{thebibliography}")
         return output_file
 
-def generate_appendices(query: str, sections: List[Dict], output_file: str, from_generator_func) -> Optional[str]:
-    """Generates the appendices section with a softened decision prompt."""
-    
+def generate_bibliography(query: str, sections: List[Dict], output_file: str, from_generator_func):
+    """Generates the bibliography section with a robust prompt and safer processing."""
+    try:
+        raw_output = request_bibliography(query, from_generator_func)
+    except Exception as e:
+        logger.error("Error in generate_bibliography: %s", e)
+        raw_output = None
+    return write_bibliography(raw_output, output_file)
+
+def decide_appendices(query: str, from_generator_func) -> Optional[bool]:
+    """
+    Asks the LLM, with a softened decision prompt, whether the report needs appendices.
+    Returns None when the call failed, so callers can tell "no" from "unknown".
+    """
     decision_prompt = f"""Based on the report topic "{query}", would an appendix section for extra data, source code, or a glossary be beneficial? Please respond with a full sentence, starting with YES or NO."""
     try:
-        decision = from_generator_func(decision_prompt)
+        decision = from_generator_func(decision_prompt, task=TASK_APPENDIX_DECISION)
+        if is_failed_generation(decision):
+            logger.warning("Appendix decision-making failed: %s. Skipping appendices.", decision)
+            return None
         if "YES" not in decision.upper():
             logger.info("Appendices not deemed necessary by LLM.")
-            return None
+            return False
+        return True
     except Exception as e:
-        logger.warning(f"Appendix decision-making failed: {e}. Skipping appendices.")
+        logger.warning("Appendix decision-making failed: %s. Skipping appendices.", e)
+        return None
+
+def request_appendices(query: str, from_generator_func, decision: Optional[bool] = None) -> Optional[str]:
+    """
+    Returns the raw appendix markdown, or None when no appendices are wanted (or the
+    call failed). `decision` is the result of decide_appendices when the caller
+    already has it; otherwise the LLM is asked first.
+    """
+    if decision is None:
+        decision = decide_appendices(query, from_generator_func)
+    if not decision:
         return None
 
     logger.info("Generating appendices content...")
@@ -91,12 +121,21 @@ Example:
 ## Appendix B: Glossary of Terms
 ... content for appendix B ..."""
     try:
-        raw_content = from_generator_func(content_prompt)
+        raw_content = from_generator_func(content_prompt, task=TASK_APPENDIX)
         if not raw_content.strip():
             logger.info("LLM returned empty content for appendix.")
             return None
-            
-        processed_content = process_llm_output_for_latex(raw_content)
+        return raw_content
+    except Exception as e:
+        logger.error("Error in request_appendices: %s", e)
+        return None
+
+def write_appendices(raw_content: Optional[str], output_file: str) -> Optional[str]:
+    """Renders raw appendix markdown as a LaTeX fragment; returns None if there is nothing to write."""
+    if not raw_content or is_failed_generation(raw_content):
+        return None
+    try:
+        processed_content = repair_fragment(process_llm_output_for_latex(raw_content), "appendices")
 
         final_content = f"""\\appendix
 \\clearpage
@@ -105,8 +144,12 @@ Example:
 
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(final_content)
-        logger.info(f"Appendices written to {output_file}")
+        logger.info("Appendices written to %s", output_file)
         return output_file
     except Exception as e:
-        logger.error(f"Error in generate_appendices: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error in write_appendices: %s", e)
+        return None
+
+def generate_appendices(query: str, sections: List[Dict], output_file: str, from_generator_func, decision: Optional[bool] = None) -> Optional[str]:
+    """Generates the appendices section; see request_appendices for `decision`."""
+    return write_appendices(request_appendices(query, from_generator_func, decision), output_file)
@@ -1,44 +1,262 @@
 # src/toc.py
-import logging
+import re
 import json
-from typing import List, Dict, Any
+import bisect
+import logging
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from jsonschema import Draft7Validator
+
+from model_router import TASK_TOC, TASK_REPAIR, is_failed_generation
 
 # Configure logging
 logger = logging.getLogger()
 
+TOC_SCHEMA = {
+    "type": "array",
+    "minItems": 1,
+    "items": {
+        "type": "object",
+        "required": ["title"],
+        "properties": {
+            "title": {"type": "string", "minLength": 1},
+            "subsections": {
+                "type": "array",
+                "items": {
+                    "anyOf": [
+                        {"type": "string"},
+                        {"type": "object", "required": ["title"], "properties": {"title": {"type": "string"}}}
+                    ]
+                }
+            }
+        }
+    }
+}
+# Compiled once; validating a TOC is then a cheap tree walk.
+Draft7Validator.check_schema(TOC_SCHEMA)
+TOC_VALIDATOR = Draft7Validator(TOC_SCHEMA)
+
 def generate_toc( # This function is not strictly needed anymore as \tableofcontents is used.
     sections: List[Dict[str, Any]],
     output_file: str = "toc.tex"
 ) -> str:
-    logger.info(f"Generating TOC file (legacy) for {len(sections)} sections: {output_file}")
+    logger.info("Generating TOC file (legacy) for %s sections: %s", len(sections), output_file)
     with open(output_file, "w", encoding="utf-8") as f:
         f.write("\\tableofcontents\n\\newpage\n")
     return output_file
 
-def _clean_toc_response(response_text: str) -> str:
-    response_text = response_text.strip()
-    if response_text.startswith("```json"):
-        response_text = response_text[len("```json"):].strip()
-    elif response_text.startswith("```"):
-        response_text = response_text[len("```"):].strip()
-    
-    if response_text.endswith("```"):
-        response_text = response_text[:-len("```")].strip()
-    
-    last_brace = response_text.rfind(']')
-    last_curly = response_text.rfind('}')
-    end_index = max(last_brace, last_curly)
-    if end_index != -1 and end_index < len(response_text) -1:
-        char_after = response_text[end_index+1:].strip()
-        if char_after and not char_after.startswith(","):
-            logger.warning(f"TOC response might have trailing text after JSON. Trimming. Original end: '{response_text[end_index:end_index+20]}...'")
-            response_text = response_text[:end_index+1]
+class FallbackToc(list):
+    """
+    The built-in TOC returned when generation failed. It is a plain list, so callers
+    use it like any TOC, but checkpointing code can tell it apart and not store it.
+    """
+
+class StructuredOutputError(ValueError):
+    """Raised when an LLM response holds no JSON value matching the expected schema, even after repair."""
+
+_JSON_OPENERS = {"[": "]", "{": "}"}
+_JSON_WHITESPACE = " \t\r\n"
+# Numbers and the true/false/null literals, i.e. every JSON value that is not a string or container.
+_BARE_VALUE = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null")
+
+# What a container accepts next.
+_EXPECT_VALUE, _EXPECT_MEMBER_VALUE, _EXPECT_KEY, _EXPECT_COLON, _EXPECT_COMMA = range(5)
+
+class _Container:
+    """An open [ or { during the scan, with just enough grammar state to know whether it is JSON."""
+    __slots__ = ("start", "closer", "expect", "valid", "first_candidate", "trailing_comma")
+
+    def __init__(self, start: int, opener: str, first_candidate: int):
+        self.start = start
+        self.closer = _JSON_OPENERS[opener]
+        self.expect = _EXPECT_VALUE if opener == "[" else _EXPECT_KEY
+        self.valid = True
+        self.first_candidate = first_candidate  # candidates found inside it start at this index
+        self.trailing_comma: Optional[int] = None
+
+    def add_value(self, is_string: bool = False):
+        if self.expect in (_EXPECT_VALUE, _EXPECT_MEMBER_VALUE):
+            self.expect = _EXPECT_COMMA
+        elif self.expect == _EXPECT_KEY and is_string:
+            self.expect = _EXPECT_COLON
+        else:
+            self.valid = False
+        self.trailing_comma = None
+
+    def add_punctuation(self, char: str, index: int):
+        if char == ":" and self.expect == _EXPECT_COLON:
+            self.expect = _EXPECT_MEMBER_VALUE
+        elif char == "," and self.expect == _EXPECT_COMMA:
+            self.expect = _EXPECT_VALUE if self.closer == "]" else _EXPECT_KEY
+            self.trailing_comma = index
+        else:
+            self.valid = False
+
+    def closes_valid(self) -> bool:
+        # Closing right after a comma is accepted: trailing commas are dropped before decoding.
+        return self.valid and self.expect not in (_EXPECT_COLON, _EXPECT_MEMBER_VALUE)
+
+def _skip_string(text: str, index: int, container: _Container) -> int:
+    """Returns the index after the string opening at `index`; an invalid string invalidates `container`."""
+    try:
+        return json.decoder.scanstring(text, index + 1)[1]
+    except json.JSONDecodeError:
+        # A raw newline, bad escape or missing quote: find the end the lenient way.
+        container.valid = False
+        position = index + 1
+        while position < len(text):
+            if text[position] == "\\":
+                position += 2
+                continue
+            if text[position] == '"':
+                return position + 1
+            position += 1
+        return len(text)
 
-    return response_text
+def _decode_candidates(text: str, candidates: List[Tuple[int, int]], dropped_commas: List[int]) -> Iterator[Any]:
+    for start, end in candidates:
+        pieces, previous = [], start
+        for comma in dropped_commas[bisect.bisect_left(dropped_commas, start):bisect.bisect_left(dropped_commas, end)]:
+            pieces.append(text[previous:comma])
+            previous = comma + 1
+        pieces.append(text[previous:end])
+        try:
+            yield json.loads("".join(pieces))
+        except (ValueError, RecursionError) as e:
+            logger.debug("Skipping JSON candidate at %s-%s: %s", start, end, e)
+    candidates.clear()
+
+def iter_json_values(text: str, openers: str = "[{") -> Iterator[Any]:
+    """
+    Yields each balanced JSON value embedded in `text`, in order. Surrounding prose and
+    code fences are ignored and trailing commas are dropped. A span that turns out not to
+    be JSON (e.g. "[see 1]" in prose) is skipped, but JSON values inside it are still found.
+
+    The text is read in one forward pass: every open container tracks its own JSON grammar
+    state, so whether a span is valid is known when it closes, without rescanning it. A
+    closing bracket that does not match fails every open container at once, and the scan
+    simply carries on, which keeps malformed input (e.g. thousands of "[") linear.
+    """
+    stack: List[_Container] = []
+    # Valid closed spans not yet yielded. A valid container replaces the candidates found inside it.
+    candidates: List[Tuple[int, int]] = []
+    dropped_commas: List[int] = []
+    index, length = 0, len(text)
+    while index < length:
+        char = text[index]
+        if not stack:
+            if char in _JSON_OPENERS and char in openers:
+                stack.append(_Container(index, char, len(candidates)))
+            index += 1
+            continue
+        container = stack[-1]
+        if char in _JSON_WHITESPACE:
+            index += 1
+        elif char == '"':
+            index = _skip_string(text, index, container)
+            container.add_value(is_string=True)
+        elif char in _JSON_OPENERS:
+            stack.append(_Container(index, char, len(candidates)))
+            index += 1
+        elif char in "]}":
+            index += 1
+            if char != container.closer:
+                # Scanning from any open container would hit this same bracket: none of them is JSON.
+                stack.clear()
+                yield from _decode_candidates(text, candidates, dropped_commas)
+                continue
+            stack.pop()
+            valid = container.closes_valid()
+            if valid:
+                if container.trailing_comma is not None:
+                    dropped_commas.append(container.trailing_comma)
+                del candidates[container.first_candidate:]
+                candidates.append((container.start, index))
+            if stack:
+                if valid:
+                    stack[-1].add_value()
+                else:
+                    stack[-1].valid = False
+            else:
+                yield from _decode_candidates(text, candidates, dropped_commas)
+        elif char in ",:":
+            container.add_punctuation(char, index)
+            index += 1
+        else:
+            match = _BARE_VALUE.match(text, index)
+            if match:
+                container.add_value()
+                index = match.end()
+            else:
+                container.valid = False
+                index += 1
+    # Containers still open at the end are not JSON, but valid values inside them are.
+    yield from _decode_candidates(text, candidates, dropped_commas)
+
+def _schema_errors(value: Any, validator: Draft7Validator, limit: int = 5) -> List[str]:
+    errors = sorted(validator.iter_errors(value), key=lambda e: list(e.absolute_path))
+    return [f"{'/'.join(map(str, e.absolute_path)) or '(root)'}: {e.message}" for e in errors[:limit]]
+
+def _first_valid_value(raw: str, validator: Draft7Validator) -> Tuple[Any, List[str]]:
+    """Returns (value, []) for the first embedded JSON value matching the schema, else (None, errors)."""
+    first_errors = None
+    for value in iter_json_values(raw):
+        errors = _schema_errors(value, validator)
+        if not errors:
+            return value, []
+        if first_errors is None:
+            first_errors = errors  # report what was wrong with the first candidate
+    return None, first_errors or ["no JSON value found in the response"]
+
+def _check_response(raw: Optional[str], description: str):
+    if not raw:
+        raise StructuredOutputError(f"Empty response for {description}")
+    # Repairing a failed call's error message would only waste another call.
+    if is_failed_generation(raw):
+        raise StructuredOutputError(f"{description} generation failed: {raw}")
+
+def parse_structured_output(
+    raw: Optional[str], validator: Draft7Validator, generator_func=None,
+    description: str = "LLM", max_repairs: int = 1
+) -> Any:
+    """
+    Extracts and validates a JSON value from an LLM response. On failure, and only then,
+    `generator_func` gets a short repair prompt holding the schema errors and the broken
+    response (TASK_REPAIR, routed to the fast tier), up to `max_repairs` times.
+    Raises StructuredOutputError if no valid value is obtained, straight away when the
+    call itself failed (an empty or "Error: ..." response has nothing to repair).
+    """
+    _check_response(raw, description)
+    value, errors = _first_valid_value(raw, validator)
+    for attempt in range(1, max_repairs + 1):
+        if not errors or generator_func is None:
+            break
+        logger.warning("Invalid %s response (%s); requesting repair %s/%s.", description, "; ".join(errors), attempt, max_repairs)
+        repair_prompt = f"""
+    The {description} response below was supposed to be JSON matching this JSON Schema, but it is invalid.
+
+    ERRORS:
+    {chr(10).join("- " + error for error in errors)}
+
+    JSON SCHEMA:
+    {json.dumps(validator.schema)}
+
+    RESPONSE:
+    {raw}
+
+    Return ONLY the corrected JSON, keeping the original content wherever it is valid. No explanation, no code fences.
+    """
+        raw = generator_func(repair_prompt, task=TASK_REPAIR)
+        _check_response(raw, f"{description} repair")
+        value, errors = _first_valid_value(raw, validator)
+    if errors:
+        raise StructuredOutputError(f"Invalid {description}: {'; '.join(errors)}")
+    return value
 
 def generate_toc_from_query(query: str, from_generator_func=None) -> List[Dict[str, Any]]:
     """
     Generate a table of contents structure from a user query using an AI model.
+    If the model call or parsing fails, a FallbackToc is returned instead.
     """
     if not from_generator_func:
         from generator import call_gemini
@@ -91,35 +309,25 @@ def generate_toc_from_query(query: str, from_generator_func=None) -> List[Dict[s
     
     raw_response = ""
     try:
-        raw_response = from_generator_func(prompt)
-        if not raw_response:
-            logger.error("Received empty response from LLM for TOC generation.")
-            raise ValueError("Empty response for TOC")
-
-        cleaned_response = _clean_toc_response(raw_response)
-        logger.debug(f"Cleaned TOC response from LLM: {cleaned_response[:500]}...")
-        sections = json.loads(cleaned_response)
-        
-        if not isinstance(sections, list):
-            logger.error(f"Parsed TOC is not a list, but {type(sections)}. Raw: {raw_response[:300]}")
-            raise ValueError("TOC is not a list")
-        
+        raw_response = from_generator_func(prompt, task=TASK_TOC)
+        sections = parse_structured_output(raw_response, TOC_VALIDATOR, from_generator_func, "TOC")
+
         valid_sections = []
         seen_titles = set()
         for sec_idx, sec_data in enumerate(sections):
             if not isinstance(sec_data, dict):
-                logger.warning(f"TOC item at index {sec_idx} is not a dictionary, skipping: {sec_data}")
+                logger.warning("TOC item at index %s is not a dictionary, skipping: %s", sec_idx, sec_data)
                 continue
 
             title = sec_data.get("title")
             if not title or not isinstance(title, str) or not title.strip():
-                logger.warning(f"TOC item at index {sec_idx} has missing, invalid, or empty title, skipping: {sec_data}")
+                logger.warning("TOC item at index %s has missing, invalid, or empty title, skipping: %s", sec_idx, sec_data)
                 continue
             
             title = title.strip() # Basic strip for safety, main_content.clean_title_for_latex_command does heavy lifting
 
             if title in seen_titles:
-                logger.warning(f"Duplicate section title '{title}' found and skipped.")
+                logger.warning("Duplicate section title '%s' found and skipped.", title)
                 continue
             
             processed_section = {"title": title}
@@ -147,7 +355,7 @@ def generate_toc_from_query(query: str, from_generator_func=None) -> List[Dict[s
                             processed_subsections.append({"title": sub_title})
                         seen_sub_titles.add(sub_title)
                     elif sub_title: # Duplicate sub_title
-                        logger.warning(f"Duplicate subsection title '{sub_title}' in section '{title}' skipped.")
+                        logger.warning("Duplicate subsection title '%s' in section '%s' skipped.", sub_title, title)
                 if processed_subsections:
                     processed_section["subsections"] = processed_subsections
             
@@ -157,26 +365,25 @@ def generate_toc_from_query(query: str, from_generator_func=None) -> List[Dict[s
             logger.error("No valid sections found after parsing and validation. Using fallback TOC.")
             raise ValueError("No valid sections after cleanup.")
 
-        logger.info(f"Generated TOC structure with {len(valid_sections)} main sections.")
+        logger.info("Generated TOC structure with %s main sections.", len(valid_sections))
         return valid_sections
         
-    except json.JSONDecodeError as je:
-        logger.error(f"Error decoding JSON for TOC: {je}")
-        logger.error(f"Problematic cleaned response snippet for TOC: {cleaned_response[:500]}...")
-        logger.error(f"Original raw response snippet for TOC: {raw_response[:500]}...")
+    except StructuredOutputError as se:
+        logger.error("Could not parse TOC: %s", se)
+        logger.error("Original raw response snippet for TOC: %s...", (raw_response or "")[:500])
     except Exception as e:
-        logger.error(f"Error generating or parsing TOC structure: {e}")
-        logger.error(f"Raw response for TOC (if available): {raw_response[:500]}...")
+        logger.error("Error generating or parsing TOC structure: %s", e)
+        logger.error("Raw response for TOC (if available): %s...", raw_response[:500])
         
     # Fallback TOC if any error occurs
-    return [
+    return FallbackToc([
         {"title": "Introduction", "subsections": [{"title": "Background"}, {"title": "Objectives"}]},
         {"title": "Literature Review"},
         {"title": "Methodology"},
         {"title": "Results"},
         {"title": "Discussion"},
         {"title": "Conclusion"}
-    ]
+    ])
 
 if __name__ == "__main__":
     # Test function
@@ -0,0 +1,15 @@
+# backend/tests/conftest.py
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# generator configures the Gemini SDK (and needs an API key) at import time. Tests never
+# talk to the API: they pass or monkeypatch their own generator functions.
+if "generator" not in sys.modules:
+    _generator = types.ModuleType("generator")
+    _generator.GEMINI_MAX_CONCURRENCY = 4
+    _generator.call_gemini = lambda prompt, task=None, **kwargs: "Error: no Gemini model in tests."
+    _generator.log_latency_stats = lambda: None
+    sys.modules["generator"] = _generator
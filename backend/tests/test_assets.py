@@ -0,0 +1,24 @@
+# backend/tests/test_assets.py
+import asyncio
+import io
+import os
+import time
+
+from assets import AssetStore
+
+class _Upload:
+    def __init__(self, data: bytes, filename: str):
+        self.filename = filename
+        self._file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+def test_reused_asset_counts_as_recently_used(tmp_path):
+    store = AssetStore(str(tmp_path / "assets"))
+    path = asyncio.run(store.store_upload(_Upload(b"logo bytes", "logo.png")))
+    long_ago = time.time() - 30 * 24 * 3600
+    os.utime(path, (long_ago, long_ago))
+
+    assert asyncio.run(store.store_upload(_Upload(b"logo bytes", "logo.png"))) == path
+    assert time.time() - os.stat(path).st_mtime < 60
@@ -0,0 +1,32 @@
+# backend/tests/test_batch.py
+import json
+
+import pytest
+
+import batch
+from batch import batch_worker_count, parse_manifest
+
+def _manifest(*ids):
+    return "\n".join(json.dumps({"id": item_id, "title": "Title", "query": "Query"}) for item_id in ids)
+
+def test_batch_worker_count_never_exceeds_the_configured_maximum(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_WORKERS", 4)
+    assert batch_worker_count(None, 10) == 4
+    assert batch_worker_count(2, 10) == 2
+    assert batch_worker_count(1000, 10) == 4
+    assert batch_worker_count(None, 3) == 3
+
+@pytest.mark.parametrize("max_workers", [0, -5])
+def test_batch_worker_count_rejects_non_positive_values(max_workers):
+    with pytest.raises(ValueError):
+        batch_worker_count(max_workers, 10)
+
+def test_parse_manifest_caps_the_number_of_items():
+    assert len(parse_manifest(_manifest("a", "b", "c"), "m.jsonl", max_items=3)) == 3
+    with pytest.raises(ValueError):
+        parse_manifest(_manifest("a", "b", "c", "d"), "m.jsonl", max_items=3)
+
+def test_parse_manifest_keeps_ids_unique_when_a_suffix_is_taken():
+    ids = [spec["id"] for spec in parse_manifest(_manifest("x_3", "x", "x", "x"), "m.jsonl")]
+    assert len(set(ids)) == len(ids)
+    assert ids[:2] == ["x_3", "x"]
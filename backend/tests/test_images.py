@@ -0,0 +1,44 @@
+# backend/tests/test_images.py
+from PIL import Image, ImageCms, PngImagePlugin
+
+from images import normalize_image
+
+def _striped_palette_image(path, size):
+    img = Image.new("P", size)
+    img.putpalette([0, 0, 0, 255, 255, 255] + [0] * 762)
+    img.putdata([(x // 3) % 2 for y in range(size[1]) for x in range(size[0])])
+    img.save(path)
+
+def test_palette_images_are_resampled_smoothly(tmp_path):
+    src_path = tmp_path / "diagram.png"
+    _striped_palette_image(src_path, (4000, 40))
+
+    normalized_path = normalize_image(str(src_path), 0.5, cache_dir=str(tmp_path / "cache"))
+    with Image.open(normalized_path) as out:
+        assert out.width < 4000
+        # NEAREST would keep only black and white; LANCZOS blends the stripes into greys.
+        assert len(out.convert("RGB").getcolors(256 * 256)) > 2
+
+def test_small_images_without_metadata_pass_through(tmp_path):
+    src_path = tmp_path / "logo.jpg"
+    Image.new("RGB", (32, 32), "red").save(src_path)
+
+    assert normalize_image(str(src_path), 0.5, cache_dir=str(tmp_path / "cache")) == str(src_path)
+
+def test_small_images_are_stripped_of_metadata(tmp_path):
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    jpeg_path = tmp_path / "photo.jpg"
+    Image.new("RGB", (32, 32), "red").save(jpeg_path, exif=exif, comment=b"private")
+    text = PngImagePlugin.PngInfo()
+    text.add_text("Author", "Jane Doe")
+    png_path = tmp_path / "diagram.png"
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    Image.new("RGB", (32, 32), "blue").save(png_path, pnginfo=text, icc_profile=icc_profile)
+
+    for src_path in (jpeg_path, png_path):
+        normalized_path = normalize_image(str(src_path), 0.5, cache_dir=str(tmp_path / "cache"))
+        assert normalized_path != str(src_path)
+        with Image.open(normalized_path) as out:
+            assert out.size == (32, 32)
+            assert not set(out.info) & {"exif", "comment", "Author", "icc_profile"}
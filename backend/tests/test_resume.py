@@ -0,0 +1,114 @@
+# backend/tests/test_resume.py
+import os
+import shutil
+
+import pytest
+
+import main_content
+import orchestrator
+from job_store import JobStore, new_job_id
+from model_router import TASK_TOC, TASK_REPAIR
+
+TOC_JSON = '[{"title": "Sensor Fusion"}, {"title": "Ethical Considerations"}]'
+
+@pytest.fixture(autouse=True)
+def no_section_pacing(monkeypatch):
+    monkeypatch.setattr(main_content, "traced_sleep", lambda seconds, reason: None)
+
+def test_resume_retries_a_failed_toc(tmp_path, monkeypatch):
+    toc_available = False
+
+    def fake_gemini(prompt, task=None, **kwargs):
+        if task in (TASK_TOC, TASK_REPAIR):
+            return TOC_JSON if toc_available else "Error: The AI service is currently unavailable."
+        return f"Generated for: {prompt}"
+
+    monkeypatch.setattr(orchestrator, "call_gemini", fake_gemini)
+    store = JobStore(str(tmp_path / "jobs"))
+    job_id = new_job_id()
+    report_generator = orchestrator.ReportGenerator(output_dir=str(tmp_path / "out"), use_rag=False, job_store=store)
+    first_path = report_generator.generate_report(
+        "Autonomous vehicles", "AV Report", ["Author"], "2025", None, None, None, "0,0,0", None, None,
+        job_id=job_id, output_format="markdown"
+    )
+
+    # The fallback TOC was used for the preview, but neither it nor sections written for it were stored.
+    assert "Introduction" in open(first_path, encoding="utf-8").read()
+    stages = store.get_job(job_id)["stages"]
+    assert "toc" not in stages
+    assert not [stage for stage in stages if stage.startswith("section_md:")]
+
+    toc_available = True
+    resumed_path = orchestrator.resume_job(store, job_id)
+
+    assert [section["title"] for section in store.get_stage(job_id, "toc")] == ["Sensor Fusion", "Ethical Considerations"]
+    assert "Sensor Fusion" in store.get_stage(job_id, "section_md:0")
+    resumed = open(resumed_path, encoding="utf-8").read()
+    assert "Sensor Fusion" in resumed and "Introduction" not in resumed
+
+def test_resume_retries_a_bibliography_request_that_raised(tmp_path, monkeypatch):
+    bibliography_available = False
+
+    def fake_request_bibliography(query, generator_func):
+        if not bibliography_available:
+            raise ConnectionError("connection reset")
+        return "\\bibitem{Smith2023} Smith, J. (2023). *Perception Stacks*."
+
+    monkeypatch.setattr(orchestrator, "call_gemini", lambda prompt, task=None, **kwargs: TOC_JSON if task == TASK_TOC else "NO appendices needed.")
+    monkeypatch.setattr(orchestrator, "request_bibliography", fake_request_bibliography)
+    store = JobStore(str(tmp_path / "jobs"))
+    job_id = new_job_id()
+    report_generator = orchestrator.ReportGenerator(output_dir=str(tmp_path / "out"), use_rag=False, job_store=store)
+    report_generator.generate_report(
+        "Autonomous vehicles", "AV Report", ["Author"], "2025", None, None, None, "0,0,0", None, None,
+        job_id=job_id, output_format="markdown"
+    )
+    assert "bibliography_md" not in store.get_job(job_id)["stages"]
+
+    bibliography_available = True
+    resumed_path = orchestrator.resume_job(store, job_id)
+    assert "Smith2023" in store.get_stage(job_id, "bibliography_md")
+    assert "Perception Stacks" in open(resumed_path, encoding="utf-8").read()
+
+def test_failed_jobs_keep_their_workspace(tmp_path):
+    store = JobStore(str(tmp_path / "jobs"))
+    job_ids = {status: store.create_job({}) for status in ("running", "failed", "finished")}
+    store.claim_job(job_ids["running"], "worker")
+    store.finish_job(job_ids["failed"], "failed", error="pdflatex failed")
+    store.finish_job(job_ids["finished"], "finished")
+
+    assert store.is_resumable(job_ids["running"])
+    assert store.is_resumable(job_ids["failed"])
+    assert not store.is_resumable(job_ids["finished"])
+    assert not store.is_resumable("unknown")
+
+def _build_with_logo(tmp_path, monkeypatch, logo_path):
+    from PIL import Image
+    Image.new("RGB", (8, 8), "red").save(logo_path)
+    monkeypatch.setattr(orchestrator, "call_gemini", lambda prompt, task=None, **kwargs: TOC_JSON if task == TASK_TOC else "NO appendices needed.")
+    store = JobStore(str(tmp_path / "jobs"))
+    job_id = new_job_id()
+    report_generator = orchestrator.ReportGenerator(output_dir=str(tmp_path / "out"), use_rag=False, job_store=store)
+    report_generator.generate_report(
+        "Autonomous vehicles", "AV Report", ["Author"], "2025", None, None, str(logo_path), "0,0,0", None, None,
+        job_id=job_id, output_format="markdown"
+    )
+    return store, job_id
+
+def test_resume_relinks_uploads_of_an_evicted_workspace(tmp_path, monkeypatch):
+    store, job_id = _build_with_logo(tmp_path, monkeypatch, tmp_path / "logo.png")
+    logo_name = store.get_stage(job_id, "assets")["logo"]
+    shutil.rmtree(store.workspace_dir(job_id))
+
+    orchestrator.resume_job(store, job_id)
+    assert os.path.exists(os.path.join(store.workspace_dir(job_id), logo_name))
+
+def test_resume_of_an_evicted_workspace_without_its_uploads_fails_clearly(tmp_path, monkeypatch):
+    logo_path = tmp_path / "logo.png"
+    store, job_id = _build_with_logo(tmp_path, monkeypatch, logo_path)
+    shutil.rmtree(store.workspace_dir(job_id))
+    logo_path.unlink()
+
+    with pytest.raises(RuntimeError, match="cannot be resumed"):
+        orchestrator.resume_job(store, job_id)
+    assert store.get_job(job_id)["status"] == "failed"
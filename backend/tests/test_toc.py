@@ -0,0 +1,46 @@
+# backend/tests/test_toc.py
+import time
+
+import pytest
+
+from toc import iter_json_values, parse_structured_output, StructuredOutputError, TOC_VALIDATOR
+
+@pytest.mark.parametrize("text, expected", [
+    ('Sure! ```json\n[{"title": "A", "subsections": ["B",],},]\n```', [[{"title": "A", "subsections": ["B"]}]]),
+    ('[see [1]] and {"a": {"b": [true, null, -1.5e3]}}', [[1], {"a": {"b": [True, None, -1500.0]}}]),
+    ('[{"t": "a\\"]b"}]', [[{"t": 'a"]b'}]]),
+    ('[1 2] [,] {"a":} {"a" 1} [1}] [3]', [[3]]),
+    ('[1, "raw\nnewline"] [2]', [[2]]),
+    ('[1, 2', []),
+])
+def test_iter_json_values(text, expected):
+    assert list(iter_json_values(text)) == expected
+
+@pytest.mark.parametrize("text", [
+    "[" * 200_000,
+    "{" * 200_000,
+    '[{"title": ' * 50_000,
+    '["' * 100_000,
+    "[see " * 40_000 + "]",
+])
+def test_iter_json_values_is_linear_on_malformed_input(text):
+    start = time.perf_counter()
+    assert list(iter_json_values(text)) == []
+    # A rescan after every failed candidate would take minutes on these inputs.
+    assert time.perf_counter() - start < 5
+
+def test_iter_json_values_finds_a_value_after_pathological_prefix():
+    text = "[" * 100_000 + '[{"title": "A"}]'
+    assert list(iter_json_values(text)) == [[{"title": "A"}]]
+
+def test_parse_structured_output_repairs_only_model_output():
+    prompts = []
+    def generator(prompt, task=None):
+        prompts.append(prompt)
+        return '[{"title": "Fixed"}]'
+
+    assert parse_structured_output("no json here", TOC_VALIDATOR, generator, "TOC") == [{"title": "Fixed"}]
+    assert len(prompts) == 1
+    with pytest.raises(StructuredOutputError):
+        parse_structured_output("Error: The AI service is currently unavailable.", TOC_VALIDATOR, generator, "TOC")
+    assert len(prompts) == 1